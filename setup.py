@@ -23,11 +23,19 @@ if not os.path.isfile('sima/motion/_motion.pyx'):
     USE_CYTHON = False
 
 
+# Motion correction kernels are parallelized with OpenMP where available.
+if sys.platform.startswith('linux'):
+    OPENMP_ARGS = ['-fopenmp']
+else:
+    OPENMP_ARGS = []
+
 extensions = [
     Extension(
         'sima.motion._motion',
         sources=['sima/motion/_motion.%s' % ('pyx' if USE_CYTHON else 'c')],
         include_dirs=[numpy.get_include()],
+        extra_compile_args=OPENMP_ARGS,
+        extra_link_args=OPENMP_ARGS,
     ),
     Extension(
         'sima.segment._opca',
@@ -27,15 +27,16 @@ from datetime import datetime
 from warnings import warn
 
 from shapely.geometry import MultiPolygon, Polygon, Point
-from skimage.measure import find_contours
 
 import sima.misc
 import sima.misc.imagej
+from sima.misc.labelstore import LabelStore
 
 import os
 import glob
 import re
-import scipy.io
+import shutil
+import tempfile
 
 from future import standard_library
 standard_library.install_aliases()
@@ -373,6 +374,7 @@ class ROIList(list):
         elif fmt == 'ImageJ':
             roi_list = cls(rois=sima.misc.imagej.read_imagej_roi_zip(path))
         elif fmt == 'inscopix':
+            import scipy.io
             dirnames = next(os.walk(path))[1]
             # this naming convetion for ROI masks is used in Mosiac 1.0.0b
             files = [glob.glob(os.path.join(path, dirname, '*IC filter*.mat'))
@@ -458,14 +460,18 @@ class ROIList(list):
         Parameters
         ----------
         path : str
-            The name of the pkl file to which the ROIList will be saved.
+            The name of the pkl file to which the ROIList will be saved, or
+            the directory of an ROIStore.
         label : str, optional
             The label associated with the ROIList. Defaults to using
             the timestamp as a label.
         """
 
-        time_fmt = '%Y-%m-%d-%Hh%Mm%Ss'
-        timestamp = datetime.strftime(datetime.now(), time_fmt)
+        if os.path.isdir(path):
+            ROIStore(path).add(self, label)
+            return
+
+        timestamp = _timestamp()
 
         rois = [roi.todict() for roi in self]
         try:
@@ -505,6 +511,108 @@ class ROIList(list):
         return ROIList(rois)
 
 
+class ROIStore(LabelStore):
+
+    """The ROILists of an ImagingDataset, stored with one file per label.
+
+    An index file lists the labels and their timestamps, and each ROIList
+    is pickled in a separate file, so that loading or saving one ROIList
+    does not read or rewrite the others. The pickled ROIs are cached in
+    memory until they are replaced on disk, which is detected from the
+    index file, and each access returns a new ROIList built from them.
+
+    ROIs saved in a single rois.pkl file next to the store, by older
+    versions of SIMA or with ROIList.save, are migrated when they are
+    accessed. See sima.misc.labelstore.LabelStore.
+
+    Parameters
+    ----------
+    path : str or None
+        The directory of the store, e.g. 'rois' in the directory of the
+        ImagingDataset, or None for an empty store.
+
+    """
+
+    def __init__(self, path):
+        super(ROIStore, self).__init__(path)
+        self._cache = {}
+
+    @property
+    def _legacy_path(self):
+        return os.path.join(os.path.dirname(self._path), 'rois.pkl')
+
+    def _index_reloaded(self):
+        files = set(entry['file'] for entry in self._index.values())
+        self._cache = {f: rois for f, rois in self._cache.items()
+                       if f in files}
+
+    def add(self, rois, label=None):
+        """Save an ROIList to the store.
+
+        Parameters
+        ----------
+        rois : ROIList
+            The ROIs to be saved.
+        label : str, optional
+            The label associated with the ROIList. Defaults to using
+            the timestamp as a label. An ROIList already saved with the
+            label is replaced.
+
+        Returns
+        -------
+        str
+            The label of the ROIList.
+
+        """
+        timestamp = _timestamp()
+        if label is None:
+            label = timestamp
+        self._set(label, {'rois': [roi.todict() for roi in rois],
+                          'timestamp': timestamp})
+        return label
+
+    def _write(self, label, data):
+        """Pickle the ROIs of a label and return their index entry."""
+        fd, filename = tempfile.mkstemp(
+            prefix=self._entry_prefix(label), suffix='.pkl', dir=self._path)
+        os.chmod(filename, 0o644)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        return {'file': os.path.basename(filename),
+                'timestamp': data.get('timestamp')}
+
+    def _read(self, entry):
+        filename = entry['file']
+        if filename not in self._cache:
+            with open(os.path.join(self._path, filename), 'rb') as f:
+                self._cache[filename] = f.read()
+        return ROIList(**pickle.loads(self._cache[filename]))
+
+    def _read_legacy(self, data):
+        return ROIList(**data)
+
+    def _remove(self, entry):
+        self._cache.pop(entry['file'], None)
+        try:
+            os.remove(os.path.join(self._path, entry['file']))
+        except OSError:
+            pass
+
+    def __setitem__(self, label, rois):
+        self.add(rois, label)
+
+    def __delitem__(self, label):
+        super(ROIStore, self).__delitem__(label)
+        if not len(self._index):
+            self._cache = {}
+            self._index_stat = None
+            shutil.rmtree(self._path, ignore_errors=True)
+
+
+def _timestamp():
+    return datetime.strftime(datetime.now(), '%Y-%m-%d-%Hh%Mm%Ss')
+
+
 def poly2mask(polygons, im_size):
     """Converts polygons to a sparse binary mask.
 
@@ -584,6 +692,7 @@ def mask2poly(mask, threshold=0.5):
         Returns a MultiPolygon of all masked regions.
 
     """
+    from skimage.measure import find_contours
     mask = _reformat_mask(mask)
 
     verts_list = []
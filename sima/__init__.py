@@ -3,6 +3,9 @@ Licensed under the GNU GPL version 2 or later.
 Documentation: http://www.losonczylab.org/sima
 Version 1.1.0"""
 
+import importlib
+import types
+
 from sima.imaging import ImagingDataset
 from sima.sequence import Sequence
 
@@ -10,3 +13,20 @@ from numpy.testing import Tester
 test = Tester().test
 
 __version__ = '1.1.1'
+
+
+class _LazyModule(types.ModuleType):
+
+    """Placeholder for a submodule that is imported when first used.
+
+    Importing the submodule replaces the placeholder with the module as an
+    attribute of the package.
+    """
+
+    def __getattr__(self, name):
+        return getattr(importlib.import_module(self.__name__), name)
+
+
+# Submodules with heavy dependencies are only imported when first used
+ROI = _LazyModule('sima.ROI')
+extract = _LazyModule('sima.extract')
@@ -9,7 +9,6 @@ from past.utils import old_div
 
 import os
 from datetime import datetime
-import pickle as pickle
 import itertools as it
 from multiprocessing import Pool
 import warnings
@@ -18,6 +17,8 @@ import numpy as np
 from scipy.sparse import hstack, vstack, diags, csc_matrix
 from scipy.sparse.linalg import inv
 
+from sima.misc.signals import SignalStore
+
 from future import standard_library
 standard_library.install_aliases()
 
@@ -530,15 +531,8 @@ def save_extracted_signals(dataset, rois, save_path=None, label=None,
     if label is None:
         label = signals['timestamp']
 
-    signals_filename = os.path.join(
-        save_path, 'signals_{}.pkl'.format(signals['signal_channel']))
-    try:
-        with open(signals_filename, 'rb') as f:
-            sig_data = pickle.load(f)
-    except (IOError, pickle.UnpicklingError):
-        sig_data = {}
-    sig_data[label] = signals
-    pickle.dump(sig_data,
-                open(signals_filename, 'wb'), pickle.HIGHEST_PROTOCOL)
-
-    return sig_data[label]
+    store = SignalStore(os.path.join(
+        save_path, 'signals_{}'.format(signals['signal_channel'])))
+    store[label] = signals
+
+    return signals
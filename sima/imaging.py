@@ -7,40 +7,28 @@ from builtins import input
 from builtins import zip
 from builtins import range
 from builtins import object
-from past.utils import old_div
 from past.builtins import basestring
 import warnings
-import itertools as it
+import copy
 import os
 import errno
 import csv
+from multiprocessing import Pool
 from os.path import dirname, join, abspath
 import pickle as pickle
-from distutils.version import StrictVersion
-from distutils.util import strtobool
 
 import numpy as np
-try:
-    import h5py
-except ImportError:
-    h5py_available = False
-else:
-    h5py_available = StrictVersion(h5py.__version__) >= StrictVersion('2.2.1')
 
 import sima
 import sima.misc
 from sima.misc import mkdir_p, most_recent_key, estimate_array_transform, \
     estimate_coordinate_transform
-from sima.extract import extract_rois, save_extracted_signals
-from sima.ROI import ROIList
+from sima.misc.signals import SignalStore
+from sima.misc.stats import FrameStatistics
 
 from future import standard_library
 standard_library.install_aliases()
 
-with warnings.catch_warnings():
-    warnings.simplefilter("ignore")
-    from sima.misc.tifffile import imsave
-
 
 class ImagingDataset(object):
 
@@ -88,6 +76,17 @@ class ImagingDataset(object):
         be appended.
     channel_names : list of str, optional
         Names for the channels. Defaults to ['0', '1', '2', ...].
+    dtype : data-type, optional
+        If specified, the working data type of the frames of all the
+        sequences, e.g. 'float32'. See sima.Sequence.astype.
+    cache_bytes : int, optional
+        If specified, the frames of each sequence are cached in memory, up
+        to this number of bytes per sequence, so that repeated passes over
+        the data do not recompute them. See sima.Sequence.cached.
+    n_processes : int, optional
+        The number of processes used to compute the statistics and time
+        averages of the dataset. The result does not depend on the number
+        of processes. Default: 1.
 
     Attributes
     ----------
@@ -98,17 +97,27 @@ class ImagingDataset(object):
         (num_planes, num_rows, num_columns, num_channels).
     num_frames : int
         The total number of image frames in the ImagingDataset.
-    ROIs : dict of (str, ROIList)
-        The sets of ROIs saved with this ImagingDataset.
+    ROIs : sima.ROI.ROIStore
+        The sets of ROIs saved with this ImagingDataset, indexed by label.
+        The saved ROIs are cached after they are first read, and each
+        access returns a new ROIList. Empty if the dataset has no savedir.
     time_averages : list of ndarray
         The time-averaged intensity for each channel.
+    statistics : sima.misc.stats.FrameStatistics
+        Per-pixel summary statistics of all the frames, such as the mean,
+        variance, minimum and maximum, computed in a single pass over the
+        data and saved in the dataset directory.
+    n_processes : int
+        The number of processes used to compute the statistics.
 
     """
 
     def __init__(self, sequences, savedir, channel_names=None,
-                 read_only=False):
+                 read_only=False, dtype=None, cache_bytes=None,
+                 n_processes=1):
 
         self._read_only = read_only
+        self.n_processes = n_processes
         if sequences is None:
             # Special case used to load an existing ImagingDataset
             if not savedir:
@@ -137,6 +146,10 @@ class ImagingDataset(object):
             except KeyError:
                 pass
         elif all(isinstance(s, sima.Sequence) for s in sequences):
+            if dtype is not None:
+                sequences = [s.astype(dtype) for s in sequences]
+            if cache_bytes is not None:
+                sequences = [s.cached(cache_bytes) for s in sequences]
             self.savedir = savedir
             self.sequences = sequences
             if channel_names is None:
@@ -196,7 +209,12 @@ class ImagingDataset(object):
             del self._time_averages
         except AttributeError:
             pass
+        try:
+            del self._statistics
+        except AttributeError:
+            pass
         # TODO: Delete time_averages.pkl? Is that too aggressive?
+        # Saved statistics are recomputed if the number of frames differs.
         self._sequences = sequences
 
     @property
@@ -249,6 +267,7 @@ class ImagingDataset(object):
                 os.makedirs(savedir)
             except OSError as exc:
                 if exc.errno == errno.EEXIST and os.path.isdir(savedir):
+                    from distutils.util import strtobool
                     overwrite = strtobool(
                         input("Overwrite existing directory ({})? ".format(
                             savedir)))
@@ -261,13 +280,20 @@ class ImagingDataset(object):
             else:
                 self._savedir = savedir
             if orig_dir:
-                from shutil import copy2
+                from shutil import copy2, copytree
                 for f in os.listdir(orig_dir):
-                    if f.endswith('.pkl'):
+                    if f.endswith('.pkl') or f == 'statistics.npz':
                         try:
                             copy2(os.path.join(orig_dir, f), self.savedir)
                         except IOError:
                             pass
+                    elif (f == 'rois' or f.startswith('signals_')) and \
+                            os.path.isdir(os.path.join(orig_dir, f)):
+                        try:
+                            copytree(os.path.join(orig_dir, f),
+                                     os.path.join(self.savedir, f))
+                        except (IOError, OSError):
+                            pass
             if self._read_only:
                 self._read_only = False
 
@@ -291,26 +317,103 @@ class ImagingDataset(object):
                     self._time_averages = time_averages
                     return self._time_averages
 
-        sums = np.zeros(self.frame_shape)
-        counts = np.zeros(self.frame_shape)
-        for frame in it.chain.from_iterable(self):
-            sums += np.nan_to_num(frame)
-            counts[np.isfinite(frame)] += 1
-        averages = old_div(sums, counts)
+        averages = self.statistics.mean
         if self.savedir is not None and not self._read_only:
             with open(join(self.savedir, 'time_averages.pkl'), 'wb') as f:
                 pickle.dump(averages, f, pickle.HIGHEST_PROTOCOL)
         self._time_averages = averages
         return self._time_averages
 
+    @property
+    def statistics(self):
+        statistics = self._stored_statistics()
+        if statistics is not None:
+            self._statistics = statistics
+            return self._statistics
+
+        statistics = _frame_statistics(
+            self.sequences, self.frame_shape, self.n_processes)
+        if self.savedir is not None and not self._read_only:
+            statistics.save(join(self.savedir, 'statistics.npz'))
+        self._statistics = statistics
+        return self._statistics
+
+    def _stored_statistics(self):
+        """Return the statistics if they have already been computed or
+        saved, without reading any frames, and None otherwise."""
+        if hasattr(self, '_statistics'):
+            return self._statistics
+        if self.savedir is not None:
+            try:
+                statistics = FrameStatistics.load(
+                    join(self.savedir, 'statistics.npz'))
+            except IOError:
+                pass
+            else:
+                if statistics.num_frames == self.num_frames and \
+                        statistics.frame_shape == tuple(self.frame_shape):
+                    return statistics
+        return None
+
+    def append_sequences(self, sequences):
+        """Add sequences to the ImagingDataset.
+
+        The number of frames, the statistics and the time averages of the
+        dataset are updated from the new sequences alone if the statistics
+        of the existing sequences have already been computed, and are
+        otherwise recomputed when they are next needed. The dataset is then
+        saved, if it has a savedir.
+
+        Parameters
+        ----------
+        sequences : list of sima.Sequence
+            The sequences to add, with frames of the same shape as those of
+            the dataset.
+        """
+        sequences = list(sequences)
+        if not all(isinstance(s, sima.Sequence) for s in sequences):
+            raise TypeError('ImagingDataset objects must be initialized '
+                            'with a list of sequences.')
+        if not all(s.shape[1:] == self.frame_shape for s in sequences):
+            raise ValueError(
+                'All sequences must have images of the same size ' +
+                'and the same number of channels.')
+        if self._read_only:
+            raise Exception('Cannot modify read-only dataset.  Change '
+                            'savedir to a new directory')
+        statistics = self._stored_statistics()
+        num_frames = self.num_frames
+        self._sequences = self.sequences + sequences
+        self._num_sequences = len(self._sequences)
+        self._num_frames = num_frames + sum(len(s) for s in sequences)
+        for attr in ['_statistics', '_time_averages']:
+            try:
+                delattr(self, attr)
+            except AttributeError:
+                pass
+        if statistics is not None:
+            # continue from the statistics of the existing frames
+            self._statistics = _frame_statistics(
+                sequences, self.frame_shape, self.n_processes,
+                copy.deepcopy(statistics))
+        if self.savedir is not None:
+            self.save()
+            try:
+                os.remove(join(self.savedir, 'time_averages.pkl'))
+            except OSError:
+                pass
+            if statistics is not None:
+                self._statistics.save(join(self.savedir, 'statistics.npz'))
+                self.time_averages  # saved from the updated statistics
+
     @property
     def ROIs(self):
-        try:
-            with open(join(self.savedir, 'rois.pkl'), 'rb') as f:
-                return {label: ROIList(**v)
-                        for label, v in pickle.load(f).items()}
-        except (IOError, pickle.UnpicklingError):
-            return {}
+        path = None if self.savedir is None else join(self.savedir, 'rois')
+        if getattr(self, '_roi_store', None) is None or \
+                self._roi_store.path != path:
+            from sima.ROI import ROIStore
+            self._roi_store = ROIStore(path)
+        return self._roi_store
 
     @classmethod
     def load(cls, path):
@@ -362,7 +465,7 @@ class ImagingDataset(object):
         """
         if self.savedir is None:
             raise Exception('Cannot add ROIs unless savedir is set.')
-        ROIs.save(join(self.savedir, 'rois.pkl'), label)
+        self.ROIs.add(ROIs, label)
 
     def import_transformed_ROIs(
             self, source_dataset, method='affine', source_channel=0,
@@ -498,7 +601,7 @@ class ImagingDataset(object):
 
         src_rois = source_dataset.ROIs
         if source_label is None:
-            source_label = most_recent_key(src_rois)
+            source_label = most_recent_key(src_rois.index)
         src_rois = src_rois[source_label]
 
         transformed_ROIs = src_rois.transform(
@@ -507,33 +610,20 @@ class ImagingDataset(object):
         self.add_ROIs(transformed_ROIs, label=target_label)
 
     def delete_ROIs(self, label):
-        """Delete an ROI set from the rois.pkl file
+        """Delete an ROI set from the saved ROIs
 
-        Removes the file if no sets left.
+        Removes the ROI directory if no sets left.
 
         Parameters
         ----------
         label : string
-            The label of the ROI Set to remove from the rois.pkl file
+            The label of the ROI Set to remove
 
         """
-
-        try:
-            with open(join(self.savedir, 'rois.pkl'), 'rb') as f:
-                rois = pickle.load(f)
-        except IOError:
-            return
-
         try:
-            rois.pop(label)
+            del self.ROIs[label]
         except KeyError:
             pass
-        else:
-            if len(rois):
-                with open(join(self.savedir, 'rois.pkl'), 'wb') as f:
-                    pickle.dump(rois, f, pickle.HIGHEST_PROTOCOL)
-            else:
-                os.remove(join(self.savedir, 'rois.pkl'))
 
     def export_averages(self, filenames, fmt='TIFF16', scale_values=True):
         """Save TIFF files with the time average of each channel.
@@ -560,7 +650,8 @@ class ImagingDataset(object):
             raise ValueError(
                 "The number of filenames must equal the number of channels.")
         if fmt == 'HDF5':
-            if not h5py_available:
+            h5py = sima.misc.optional_import('h5py', '2.2.1')
+            if h5py is None:
                 raise ImportError('h5py >= 2.2.1 required')
             f = h5py.File(filenames, 'w')
             im = self.time_averages
@@ -577,6 +668,9 @@ class ImagingDataset(object):
                 # Note: https://github.com/h5py/h5py/issues/289
             f.close()
         else:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                from sima.misc.tifffile import imsave
             for chan, filename in enumerate(filenames):
                 im = self.time_averages[:, :, :, chan]
                 if dirname(filename):
@@ -596,7 +690,7 @@ class ImagingDataset(object):
                 imsave(filename, out)
 
     def export_frames(self, filenames, fmt='TIFF16', fill_gaps=True,
-                      scale_values=False):
+                      scale_values=False, compression=None, chunks=None):
         """Export imaging data from the dataset.
 
         Parameters
@@ -614,6 +708,11 @@ class ImagingDataset(object):
         scale_values : bool, optional
             Whether to scale the values to use the full range of the
             output format. Defaults to False.
+        compression : {None, 'gzip', 'lzf'}, optional
+            The compression filter used for HDF5 output. Default: None.
+        chunks : tuple of int, optional
+            The chunk shape used for HDF5 output. See
+            sima.Sequence.export.
         """
         try:
             depth = np.array(filenames).ndim
@@ -624,7 +723,8 @@ class ImagingDataset(object):
         if fmt == 'HDF5' and not np.array(filenames).ndim == 1:
             raise TypeError('Improperly formatted filenames')
         for sequence, fns in zip(self, filenames):
-            sequence.export(fns, fmt, fill_gaps, self.channel_names)
+            sequence.export(fns, fmt, fill_gaps, self.channel_names,
+                            compression, chunks)
 
     def export_signals(self, path, fmt='csv', channel=0, signals_label=None):
         """Export extracted signals to a file.
@@ -713,10 +813,11 @@ class ImagingDataset(object):
         signal_channel = self._resolve_channel(signal_channel)
         demix_channel = self._resolve_channel(demix_channel)
 
-        if rois is None:
-            rois = self.ROIs[most_recent_key(self.ROIs)]
+        if rois is None and len(self.ROIs):
+            rois = self.ROIs[most_recent_key(self.ROIs.index)]
         if rois is None or not len(rois):
             raise Exception('Cannot extract dataset with no ROIs.')
+        from sima.extract import extract_rois, save_extracted_signals
         if self.savedir:
             return save_extracted_signals(
                 self, rois, self.savedir, label, signal_channel=signal_channel,
@@ -739,9 +840,11 @@ class ImagingDataset(object):
                             'to a new directory')
         # Keep this out side the with statement
         # If sequences haven't been loaded yet, need to read sequences.pkl
-        sequences = [seq._todict(savedir) for seq in self.sequences]
+        with sima.sequence._SidecarFiles(savedir) as sidecars:
+            sequences = [seq._todict(savedir) for seq in self.sequences]
         with open(join(savedir, 'sequences.pkl'), 'wb') as f:
             pickle.dump(sequences, f, pickle.HIGHEST_PROTOCOL)
+        sidecars.remove_unused()
 
         with open(join(savedir, 'dataset.pkl'), 'wb') as f:
             pickle.dump(self._todict(), f, pickle.HIGHEST_PROTOCOL)
@@ -765,26 +868,31 @@ class ImagingDataset(object):
         """
         rois = strategy.segment(self)
         if self.savedir is not None:
-            rois.save(join(self.savedir, 'rois.pkl'), label)
+            self.ROIs.add(rois, label)
         return rois
 
     def signals(self, channel=0):
         """Return a dictionary of extracted signals
 
+        The signals of each label are only read from disk when that label
+        is accessed, with the 'raw' and 'demixed_raw' signals memory-mapped.
+
         Parameters
         ----------
         channel : string or int
             The channel to load signals for, either an integer index or a
             string in self.channel_names
 
+        Returns
+        -------
+        sima.misc.signals.SignalStore
+            A mapping from the extraction labels to the signals.
+
         """
-        channel = self._resolve_channel(channel)
-        try:
-            with open(join(self.savedir, 'signals_{}.pkl'.format(channel)),
-                      'rb') as f:
-                return pickle.load(f)
-        except (IOError, pickle.UnpicklingError):
+        if self.savedir is None:
             return {}
+        channel = self._resolve_channel(channel)
+        return SignalStore(join(self.savedir, 'signals_{}'.format(channel)))
 
     def __str__(self):
         return '<ImagingDataset>'
@@ -802,3 +910,69 @@ class ImagingDataset(object):
     def _resolve_channel(self, chan):
         """Return the index corresponding to the channel."""
         return sima.misc.resolve_channels(chan, self.channel_names)
+
+
+# The sequences of the dataset whose statistics are computed by a process of
+# a Pool, see _init_statistics_process.
+_process_sequences = None
+
+
+def _init_statistics_process(sequence_dicts):
+    """Create the sequences from their dictionaries in a Pool process."""
+    global _process_sequences
+    _process_sequences = [d.pop('__class__')._from_dict(d)
+                          for d in sequence_dicts]
+
+
+def _block_statistics(inputs):
+    """Compute the statistics of a block of frames of a sequence.
+
+    Needs to be a top-level function to allow it to be used with Pools.
+
+    Parameters - a single three-element tuple, 'inputs'
+    ----------
+    sequence_idx : int
+        The index of the sequence in the dataset.
+    start, stop : int
+        The frames of the block.
+    """
+    sequence_idx, start, stop = inputs
+    frames = _process_sequences[sequence_idx].get_frames(start, stop)
+    statistics = FrameStatistics(frames.shape[1:])
+    statistics.update(frames)
+    return statistics
+
+
+def _frame_statistics(sequences, frame_shape, n_processes=1,
+                      statistics=None):
+    """Compute the statistics of the frames of the sequences.
+
+    The frames are split into blocks of consecutive frames, whose statistics
+    are merged in order. Since merging the statistics of a block gives
+    exactly the same result as adding the block, the result is the same for
+    any number of processes.
+
+    If statistics are given, the frames are added to them, with the same
+    result as computing the statistics of all the frames at once.
+    """
+    block_size = sima.sequence._default_block_size(
+        (None,) + tuple(frame_shape))
+    blocks = [(idx, start, start + block_size)
+              for idx, sequence in enumerate(sequences)
+              for start in range(0, len(sequence), block_size)]
+    if statistics is None:
+        statistics = FrameStatistics(frame_shape)
+    if n_processes > 1 and len(blocks) > 1:
+        pool = Pool(processes=n_processes,
+                    initializer=_init_statistics_process,
+                    initargs=([s._todict() for s in sequences],))
+        try:
+            for block_statistics in pool.imap(_block_statistics, blocks):
+                statistics.merge(block_statistics)
+        finally:
+            pool.terminate()
+        pool.join()
+    else:
+        for idx, start, stop in blocks:
+            statistics.update(sequences[idx].get_frames(start, stop))
+    return statistics
@@ -5,26 +5,77 @@ from past.utils import old_div
 import os
 import itertools as it
 import errno
-from distutils.version import LooseVersion
+import re
+import importlib
 
 import numpy as np
 try:
     from bottleneck import nanmax
 except ImportError:
     from numpy import nanmax
-try:
-    import cv2
-except ImportError:
-    cv2_available = False
-else:
-    cv2_available = LooseVersion(cv2.__version__) >= LooseVersion('2.4.8')
-from skimage import transform as tf
 
 
 class TransformError(Exception):
     pass
 
 
+_optional_modules = {}
+
+
+def version_tuple(version):
+    """Return the leading numerical components of a version string.
+
+    >>> from sima.misc import version_tuple
+    >>> version_tuple('2.4.8-dev')
+    (2, 4, 8)
+
+    """
+    parts = []
+    for part in str(version).split('.'):
+        match = re.match(r'\d+', part)
+        if match is None:
+            break
+        parts.append(int(match.group()))
+        if match.end() < len(part):
+            break
+    return tuple(parts)
+
+
+def optional_import(name, min_version=None):
+    """Import an optional dependency the first time it is needed.
+
+    Heavy or optional packages (OpenCV, h5py, etc.) are imported with this
+    function where they are used, rather than when sima is imported.
+
+    Parameters
+    ----------
+    name : str
+        The name of the module.
+    min_version : str, optional
+        The minimum required version of the module.
+
+    Returns
+    -------
+    module or None
+        The module, or None if it is not installed or is older than
+        min_version.
+
+    """
+    key = (name, min_version)
+    if key not in _optional_modules:
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            module = None
+        else:
+            if min_version is not None and version_tuple(
+                    getattr(module, '__version__', '')) < \
+                    version_tuple(min_version):
+                module = None
+        _optional_modules[key] = module
+    return _optional_modules[key]
+
+
 def lazyprop(fn):
     """Like property, but only computes on first call."""
     attr_name = '_lazy_' + fn.__name__
@@ -58,6 +109,16 @@ def mkdir_p(path):
             raise
 
 
+def replace_file(src, dst):
+    """Rename src to dst, replacing dst if it exists."""
+    try:
+        os.replace(src, dst)
+    except AttributeError:  # Python 2
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+
 def most_recent_key(d):
     """Return the key to the most recently timestamped entry"""
     try:
@@ -132,8 +193,10 @@ def estimate_array_transform(source, target, method='affine'):
     """
 
     if method == 'affine':
-        if not cv2_available:
+        cv2 = optional_import('cv2', '2.4.8')
+        if cv2 is None:
             raise ImportError('OpenCV >= 2.4.8 required')
+        from skimage import transform as tf
 
         slice_ = tuple(slice(0, min(source.shape[i], target.shape[i]))
                        for i in range(2))
@@ -180,6 +243,7 @@ def estimate_coordinate_transform(source, target, method, **method_kwargs):
 
     """
 
+    from skimage import transform as tf
     return tf.estimate_transform(method, source, target, **method_kwargs)
 
 
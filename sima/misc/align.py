@@ -26,8 +26,6 @@ try:
     from bottleneck import nanmean
 except ImportError:
     from scipy import nanmean
-import scipy.ndimage as scind
-import scipy.sparse
 
 
 def cross_correlation_3d(pixels1, pixels2):
@@ -388,6 +386,7 @@ def cumsum_quadrant(x, i_forwards, j_forwards, k_forwards=None):
 
 def entropy(x):
     '''The entropy of x as if x is a probability distribution'''
+    import scipy.ndimage as scind
     histogram = scind.histogram(x.astype(float), np.min(x), np.max(x), 256)
     n = np.sum(histogram)
     if n > 0 and np.max(histogram) > 0:
@@ -398,6 +397,7 @@ def entropy(x):
 
 def entropy2(x, y):
     '''Joint entropy of paired samples X and Y'''
+    import scipy.sparse
     #
     # Bin each image into 256 gray levels
     #
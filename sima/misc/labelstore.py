@@ -0,0 +1,196 @@
+"""Base class for data of an ImagingDataset stored with one entry per label."""
+from builtins import str
+
+import json
+import os
+import pickle
+import re
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # Python 2
+    from collections import MutableMapping
+
+from sima.misc import replace_file
+
+
+class LabelStore(MutableMapping):
+
+    """A mapping from labels to data stored in a directory, one entry per
+    label.
+
+    An index file lists the labels, their timestamps and where their data
+    are stored, so that reading or writing one label does not read or
+    rewrite the others. The index is reloaded whenever the file changes on
+    disk, e.g. because another process has written to the store.
+
+    Data saved by older versions of SIMA in a single pickle file next to
+    the store are merged into the store whenever that file is present, and
+    the file is then removed. If the store cannot be written, e.g. for a
+    read-only dataset, the data are served from the pickle file instead.
+
+    Subclasses implement _legacy_path, _write, _read, _read_legacy and
+    _remove.
+
+    Parameters
+    ----------
+    path : str or None
+        The directory of the store, or None for an empty store that cannot
+        be written, e.g. for an ImagingDataset without a savedir.
+
+    """
+
+    def __init__(self, path):
+        self._path = None if path is None else os.path.abspath(path)
+        self._index = {}
+        self._index_stat = None
+        self._legacy = {}
+        self._legacy_stat = None
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def _index_path(self):
+        return os.path.join(self._path, 'index.json')
+
+    @property
+    def _legacy_path(self):
+        """The path of the pickle file written by older versions."""
+        raise NotImplementedError
+
+    @property
+    def index(self):
+        """A dictionary with the timestamp of each label, e.g. for use with
+        sima.misc.most_recent_key."""
+        index = {label: {'timestamp': entry.get('timestamp')}
+                 for label, entry in self._load_index().items()}
+        index.update({label: {'timestamp': self._legacy_timestamp(value)}
+                      for label, value in self._legacy.items()})
+        return index
+
+    def _load_index(self):
+        """Return the index, reloading it if it has changed on disk and
+        merging in the data of a legacy pickle file."""
+        if self._path is None:
+            return self._index
+        stat = _file_stat(self._index_path)
+        if stat != self._index_stat:
+            try:
+                with open(self._index_path) as f:
+                    self._index = json.load(f)
+            except IOError:
+                self._index = {}
+            self._index_stat = stat
+            self._index_reloaded()
+        legacy_stat = _file_stat(self._legacy_path)
+        if legacy_stat is None:
+            self._legacy = {}
+            self._legacy_stat = None
+        elif legacy_stat != self._legacy_stat:
+            self._legacy_stat = legacy_stat
+            self._migrate()
+        return self._index
+
+    def _index_reloaded(self):
+        """Called after the index has been reloaded from disk."""
+        pass
+
+    def _save_index(self):
+        if not os.path.isdir(self._path):
+            os.makedirs(self._path)
+        tmp_path = self._index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f, indent=1, sort_keys=True)
+        replace_file(tmp_path, self._index_path)
+        self._index_stat = _file_stat(self._index_path)
+
+    def _migrate(self):
+        """Merge the contents of a legacy pickle file into the store."""
+        try:
+            with open(self._legacy_path, 'rb') as f:
+                legacy = pickle.load(f)
+        except (IOError, pickle.UnpicklingError):
+            return
+        index = dict(self._index)
+        old_entries = [index[label] for label in legacy if label in index]
+        try:
+            for label, value in legacy.items():
+                self._index[label] = self._write(label, value)
+            self._save_index()
+        except (IOError, OSError):
+            self._index = index
+            self._legacy = legacy
+        else:
+            self._legacy = {}
+            os.remove(self._legacy_path)
+            for entry in old_entries:
+                self._remove(entry)
+
+    def _entry_prefix(self, label):
+        """A filename prefix for the data of a label."""
+        if not os.path.isdir(self._path):
+            os.makedirs(self._path)
+        return re.sub(r'[^\w.-]', '_', str(label)) + '_'
+
+    def _write(self, label, value):
+        """Write the data of a label and return its index entry, which must
+        include a 'timestamp'."""
+        raise NotImplementedError
+
+    def _read(self, entry):
+        """Read the data of an index entry."""
+        raise NotImplementedError
+
+    def _read_legacy(self, value):
+        """Convert the data of a label in the legacy pickle file."""
+        raise NotImplementedError
+
+    def _legacy_timestamp(self, value):
+        return value.get('timestamp')
+
+    def _remove(self, entry):
+        """Delete the data of an index entry."""
+        raise NotImplementedError
+
+    def _set(self, label, value):
+        if self._path is None:
+            raise ValueError('The store has no directory to be saved in')
+        old_entry = self._load_index().get(label)
+        self._index[label] = self._write(label, value)
+        self._save_index()
+        if old_entry is not None:
+            self._remove(old_entry)
+
+    def __getitem__(self, label):
+        index = self._load_index()
+        if label in self._legacy:
+            return self._read_legacy(self._legacy[label])
+        return self._read(index[label])
+
+    def __setitem__(self, label, value):
+        self._set(label, value)
+
+    def __delitem__(self, label):
+        entry = self._load_index().pop(label)
+        self._save_index()
+        self._remove(entry)
+
+    def __iter__(self):
+        index = self._load_index()
+        return iter(list(index) +
+                    [label for label in self._legacy if label not in index])
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+
+def _file_stat(path):
+    """The (inode, modification time, size) of a file, or None."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, getattr(stat, 'st_mtime_ns', stat.st_mtime),
+            stat.st_size)
@@ -0,0 +1,134 @@
+"""Storage of extracted signals with one entry per extraction label."""
+from builtins import range
+from past.builtins import basestring
+
+import os
+import pickle
+import shutil
+import tempfile
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
+
+import numpy as np
+
+from sima.misc import lazyprop
+from sima.misc.labelstore import LabelStore
+
+# Signals that are stored as one .npy file per sequence, and memory-mapped
+# when they are read.
+ARRAY_KEYS = ('raw', 'demixed_raw')
+
+
+class SignalStore(LabelStore):
+
+    """The extracted signals of one channel of an ImagingDataset.
+
+    The signals of each extraction label are stored in a separate
+    subdirectory, with the 'raw' and 'demixed_raw' signals of each sequence
+    in a .npy file and the other values in a small pickle file. An index
+    file lists the labels. Reading a label memory-maps its signals, and
+    adding or deleting a label leaves the others untouched.
+
+    Signals saved by older versions of SIMA in a single signals_{channel}.pkl
+    file are migrated to the new layout when they are accessed. See
+    sima.misc.labelstore.LabelStore.
+
+    Parameters
+    ----------
+    path : str
+        The directory of the store, e.g. 'signals_0' in the directory of the
+        ImagingDataset.
+
+    Examples
+    --------
+
+    >>> import os, tempfile
+    >>> import numpy as np
+    >>> from sima.misc.signals import SignalStore
+    >>> store = SignalStore(os.path.join(tempfile.mkdtemp(), 'signals_0'))
+    >>> store['label'] = {'raw': [np.zeros((3, 10))],
+    ...                   'timestamp': '2015-01-01-12h00m00s'}
+    >>> store['label']['raw'][0].shape
+    (3, 10)
+
+    """
+
+    @property
+    def _legacy_path(self):
+        return self._path + '.pkl'
+
+    def _read(self, entry):
+        return SignalEntry(
+            os.path.join(self._path, entry['directory']), entry['arrays'],
+            entry['timestamp'])
+
+    def _read_legacy(self, signals):
+        return signals
+
+    def _remove(self, entry):
+        shutil.rmtree(os.path.join(self._path, entry['directory']),
+                      ignore_errors=True)
+
+    def _write(self, label, signals):
+        """Write the signals of a label and return their index entry."""
+        directory = tempfile.mkdtemp(prefix=self._entry_prefix(label),
+                                     dir=self._path)
+        os.chmod(directory, 0o755)
+        arrays = {}
+        metadata = {}
+        for key, value in signals.items():
+            if key in ARRAY_KEYS:
+                for idx, sequence_signals in enumerate(value):
+                    np.save(os.path.join(
+                        directory, '{}_{}.npy'.format(key, idx)),
+                        np.asarray(sequence_signals))
+                arrays[key] = len(value)
+            else:
+                metadata[key] = value
+        with open(os.path.join(directory, 'metadata.pkl'), 'wb') as f:
+            pickle.dump(metadata, f, pickle.HIGHEST_PROTOCOL)
+        timestamp = metadata.get('timestamp')
+        return {'directory': os.path.basename(directory), 'arrays': arrays,
+                'timestamp': timestamp if isinstance(timestamp, basestring)
+                else None}
+
+
+class SignalEntry(Mapping):
+
+    """The signals of one extraction label, read on demand.
+
+    The 'raw' and 'demixed_raw' signals are lists of read-only memory-mapped
+    arrays, one per sequence. The remaining values are loaded together when
+    the first of them is accessed.
+
+    """
+
+    def __init__(self, path, arrays, timestamp=None):
+        self._path = path
+        self._arrays = arrays
+        self._timestamp = timestamp
+
+    @lazyprop
+    def _metadata(self):
+        with open(os.path.join(self._path, 'metadata.pkl'), 'rb') as f:
+            return pickle.load(f)
+
+    def __getitem__(self, key):
+        if key in self._arrays:
+            return [np.load(os.path.join(self._path, '{}_{}.npy'.format(
+                key, idx)), mmap_mode='r') for idx in range(self._arrays[key])]
+        if key == 'timestamp' and self._timestamp is not None:
+            return self._timestamp
+        return self._metadata[key]
+
+    def __iter__(self):
+        for key in self._arrays:
+            yield key
+        for key in self._metadata:
+            yield key
+
+    def __len__(self):
+        return len(self._arrays) + len(self._metadata)
@@ -0,0 +1,157 @@
+"""Streaming per-pixel statistics of imaging data."""
+from __future__ import division
+from builtins import object
+
+import numpy as np
+
+
+class FrameStatistics(object):
+
+    """Per-pixel statistics of frames, accumulated in a single pass.
+
+    Missing values (NaN) are ignored. The means and variances are updated
+    with Welford's algorithm, generalized to blocks of frames, so that the
+    statistics of separate blocks or passes can be merged exactly.
+
+    Parameters
+    ----------
+    frame_shape : tuple of int
+        The shape (num_planes, num_rows, num_columns, num_channels) of the
+        frames.
+
+    Attributes
+    ----------
+    count : array of int
+        The number of values of each pixel.
+    num_frames : int
+        The number of frames, or blocks of pixels, that have been added.
+
+    Examples
+    --------
+
+    >>> import numpy as np
+    >>> from sima.misc.stats import FrameStatistics
+    >>> frames = np.arange(24.).reshape(3, 1, 2, 2, 2)
+    >>> frames[0, 0, 0, 0, 0] = np.nan
+    >>> stats = FrameStatistics(frames.shape[1:])
+    >>> stats.update(frames)
+    >>> stats.mean[0, 0, 0, 0], stats.count[0, 0, 0, 0]
+    (12.0, 2)
+
+    """
+
+    def __init__(self, frame_shape):
+        self.count = np.zeros(frame_shape, dtype='int64')
+        self.num_frames = 0
+        self._mean = np.zeros(frame_shape)
+        self._m2 = np.zeros(frame_shape)  # sum of squared deviations
+        self._min = np.full(frame_shape, np.nan)
+        self._max = np.full(frame_shape, np.nan)
+
+    @property
+    def frame_shape(self):
+        return self.count.shape
+
+    @property
+    def mean(self):
+        """The mean of each pixel, NaN for pixels without values."""
+        return np.where(self.count > 0, self._mean, np.nan)
+
+    @property
+    def variance(self):
+        """The (population) variance of each pixel."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 0, self._m2 / self.count, np.nan)
+
+    @property
+    def min(self):
+        """The minimum of each pixel."""
+        return self._min.copy()
+
+    @property
+    def max(self):
+        """The maximum of each pixel."""
+        return self._max.copy()
+
+    @property
+    def max_projection(self):
+        """The maximum of each pixel over time and planes, with shape
+        (num_rows, num_columns, num_channels)."""
+        return np.fmax.reduce(self._max, axis=0)
+
+    def channel_distribution(self):
+        """The mean and variance of all the values of each channel."""
+        num_channels = self.frame_shape[-1]
+        count = self.count.reshape(-1, num_channels).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = (self.count * self._mean).reshape(
+                -1, num_channels).sum(axis=0) / count
+            m2 = self._m2 + self.count * (self._mean - mean) ** 2
+            return mean, m2.reshape(-1, num_channels).sum(axis=0) / count
+
+    def update(self, frames, origin=None):
+        """Add a block of frames.
+
+        Parameters
+        ----------
+        frames : array
+            The frames, with shape (num_frames,) + frame_shape, or, if an
+            origin is given, a block of pixels of the frames.
+        origin : tuple of int, optional
+            The (plane, row, column) position in the frames of the first
+            pixel of the block.
+        """
+        if not len(frames):
+            return
+        frames = np.asarray(frames, dtype=float)
+        region = tuple(slice(o, o + n) for o, n in zip(
+            origin or (0,) * (frames.ndim - 1), frames.shape[1:]))
+        observed = np.isfinite(frames)
+        count = observed.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(observed, frames, 0).sum(axis=0) / count
+            m2 = (np.where(observed, frames - mean, 0) ** 2).sum(axis=0)
+        self._combine(region, count, np.nan_to_num(mean), m2,
+                      np.fmin.reduce(frames, axis=0),
+                      np.fmax.reduce(frames, axis=0))
+        self.num_frames += len(frames)
+
+    def merge(self, other):
+        """Add the statistics of other frames of the same shape."""
+        if other.frame_shape != self.frame_shape:
+            raise ValueError('Statistics of frames of different shapes')
+        self._combine((Ellipsis,), other.count, other._mean, other._m2,
+                      other._min, other._max)
+        self.num_frames += other.num_frames
+        return self
+
+    def _combine(self, region, count, mean, m2, min_, max_):
+        """Combine statistics of further values into those of a region."""
+        old_count = self.count[region]
+        total = old_count + count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(total > 0, count / total, 0)
+        delta = mean - self._mean[region]
+        self._mean[region] += delta * weight
+        self._m2[region] += m2 + delta ** 2 * old_count * weight
+        self.count[region] = total
+        self._min[region] = np.fmin(self._min[region], min_)
+        self._max[region] = np.fmax(self._max[region], max_)
+
+    def save(self, path):
+        """Save the statistics to a .npz file."""
+        np.savez(path, count=self.count, num_frames=self.num_frames,
+                 mean=self._mean, m2=self._m2, min=self._min, max=self._max)
+
+    @classmethod
+    def load(cls, path):
+        """Load statistics saved with FrameStatistics.save."""
+        with np.load(path) as data:
+            stats = cls(data['count'].shape)
+            stats.count = data['count']
+            stats.num_frames = int(data['num_frames'])
+            stats._mean = data['mean']
+            stats._m2 = data['m2']
+            stats._min = data['min']
+            stats._max = data['max']
+        return stats
@@ -165,9 +165,30 @@ __all__ = ['imsave', 'imread', 'imshow', 'TiffFile', 'TiffSequence']
 
 
 class TiffFileWriter(object):
-    def __init__(self, filename):
+    """Write 2D images page by page to a TIFF file.
+
+    Each page is assembled in memory with its IFD, tag values and image data
+    at precomputed offsets and written with a single write, so that no
+    seeking or flushing is required between pages.
+
+    Parameters
+    ----------
+    filename : str
+        Name of file to write.
+    bigtiff : bool
+        If True, write a BigTIFF file, which is required for files larger
+        than 4 GB.
+    compress : int
+        Zlib compression level (0 to 9) of the image data.
+
+    """
+
+    def __init__(self, filename, bigtiff=False, compress=0):
         self.fh = open(filename, 'wb')
         self.pageindex = 0
+        self._bigtiff = bigtiff
+        self._compress_level = compress
+        self._next_ifd_offset = None
 
     def _first_write(self, page, photometric=None, planarconfig=None,
                      resolution=None, description=None, software='tifffile.py',
@@ -184,20 +205,19 @@ class TiffFileWriter(object):
         # data = numpy.asarray(data, dtype=byteorder+data.dtype.char, order='C')
         # data = numpy.atleast_2d(data)
 
-        # if not bigtiff and data.size * data.dtype.itemsize < 2000*2**20:
-        bigtiff = False
-        self._offset_size = 4
-        self._tag_size = 12
-        self._numtag_format = 'H'
-        self._offset_format = 'I'
-        val_format = '4s'
-        # else:
-        #     bigtiff = True
-        #     offset_size = 8
-        #     tag_size = 20
-        #     numtag_format = 'Q'
-        #     offset_format = 'Q'
-        #     val_format = '8s'
+        if not bigtiff:
+            self._offset_size = 4
+            self._tag_size = 12
+            self._numtag_format = 'H'
+            self._offset_format = 'I'
+            val_format = '4s'
+        else:
+            self._offset_size = 8
+            self._tag_size = 20
+            self._numtag_format = 'Q'
+            self._offset_format = 'Q'
+            val_format = '8s'
+        self._bigtiff = bigtiff
 
         # unify shape of data
         samplesperpixel = 1
@@ -345,16 +365,15 @@ class TiffFileWriter(object):
         # the entries in an IFD must be sorted in ascending order by tag code
         self._tags = sorted(self._tags, key=lambda x: x[0])
 
-        self._seek = self.fh.seek
-        self._tell = self.fh.tell
-
         self._write({'<': b'II', '>': b'MM'}[self._byteorder])
         if bigtiff:
             self._write('HHH', 43, 8, 0)
+            self._pos = 16
         else:
             self._write('H', 42)
-        self._ifd_offset = self._tell()
-        self._write(self._offset_format, 0)  # first IFD
+            self._pos = 8
+        self._write(self._offset_format, self._pos)  # first IFD
+        self._next_ifd_offset = None
         self._compress = compress
 
     def _write(self, arg, *args):
@@ -363,82 +382,60 @@ class TiffFileWriter(object):
         self.fh.write(pack(arg, *args) if args else arg)
 
     def write_page(self, page):
+        """Write a 2D image as the next page of the file."""
         if self.pageindex == 0:
-            self._first_write(page)
-        page = page.reshape((1,) + page.shape + (1,))
-        # update pointer at ifd_offset
-        pos = self._tell()
-        self._seek(self._ifd_offset)
-        self._write(self._offset_format, pos)
-        self._seek(pos)
-
-        # write ifdentries
-        self._write(self._numtag_format, len(self._tags))
-        tag_offset = self._tell()
-        self._write(b''.join(t[1] for t in self._tags))
-        self._ifd_offset = self._tell()
-        self._write(self._offset_format, 0)  # offset to next IFD
-
-        # write tag values and patch offsets in ifdentries, if necessary
-        for tagindex, tag in enumerate(self._tags):
-            if tag[2]:
-                pos = self._tell()
-                self._seek(tag_offset + tagindex*self._tag_size +
-                           self._offset_size + 4)
-                self._write(self._offset_format, pos)
-                self._seek(pos)
-                if tag[0] == 273:
-                    strip_offsets_offset = pos
-                elif tag[0] == 279:
-                    strip_byte_counts_offset = pos
-                self._write(tag[2])
-
-        # write image data
-        data_offset = self._tell()
+            self._first_write(page, bigtiff=self._bigtiff,
+                              compress=self._compress_level)
         if self._compress:
-            strip_byte_counts = []
-            for plane in page:
-                plane = zlib.compress(plane, self._compress)
-                strip_byte_counts.append(len(plane))
-                self.fh.write(plane)
+            data = zlib.compress(
+                numpy.ascontiguousarray(page).tobytes(), self._compress)
         else:
-            # if this fails try update Python/numpy
-            page.tofile(self.fh)
-            self.fh.flush()
-
-        # update strip_offsets and strip_byte_counts if necessary
-        pos = self._tell()
-        for tagindex, tag in enumerate(self._tags):
-            if tag[0] == 273:  # strip_offsets
-                if tag[2]:
-                    self._seek(strip_offsets_offset)
-                    strip_offset = data_offset
-                    for size in strip_byte_counts:
-                        self._write(self._offset_format, strip_offset)
-                        strip_offset += size
-                else:
-                    self._seek(tag_offset + tagindex*self._tag_size +
-                               self._offset_size + 4)
-                    self._write(self._offset_format, data_offset)
-            elif tag[0] == 279:  # strip_byte_counts
-                if self._compress:
-                    if tag[2]:
-                        self._seek(strip_byte_counts_offset)
-                        for size in strip_byte_counts:
-                            self._write(self._offset_format, size)
-                    else:
-                        self._seek(tag_offset + tagindex*self._tag_size +
-                                   self._offset_size + 4)
-                        self._write(self._offset_format, strip_byte_counts[0])
-                break
-        self._seek(pos)
-        self.fh.flush()
+            data = numpy.ascontiguousarray(page).tobytes()
+
+        def pack(fmt, *val):
+            return struct.pack(self._byteorder+fmt, *val)
+
+        # layout: IFD, tag values, image data, then the IFD of the next page
+        ifd_offset = self._pos
+        values_offset = ifd_offset + struct.calcsize(self._numtag_format) + \
+            len(self._tags) * self._tag_size + self._offset_size
+        data_offset = values_offset + sum(
+            len(t[2]) for t in self._tags if t[2])
+        next_ifd_offset = data_offset + len(data)
+        if not self._bigtiff and next_ifd_offset >= 2**32:
+            raise ValueError('data too large for non-bigtiff file')
+
+        entries = []
+        values = []
+        value_offset = values_offset
+        for code, entry, value, _ in self._tags:
+            if value:
+                field = pack(self._offset_format, value_offset)
+                value_offset += len(value)
+                values.append(value)
+            elif code == 273:  # strip_offsets
+                field = pack(self._offset_format, data_offset)
+            elif code == 279:  # strip_byte_counts
+                field = pack(self._offset_format, len(data))
+            else:
+                field = entry[-self._offset_size:]
+            entries.append(entry[:-self._offset_size] + field)
+        self.fh.write(b''.join(
+            [pack(self._numtag_format, len(self._tags))] + entries +
+            [pack(self._offset_format, next_ifd_offset)] + values + [data]))
+        self._next_ifd_offset = values_offset - self._offset_size
+        self._pos = next_ifd_offset
+
         # remove tags that should be written only once
         if self.pageindex == 0:
             self._tags = [t for t in self._tags if not t[-1]]
         self.pageindex += 1
 
     def close(self):
+        if self._next_ifd_offset is not None:
+            # terminate the chain of IFDs at the last page
+            self.fh.seek(self._next_ifd_offset)
+            self._write(self._offset_format, 0)
         self.fh.close()
 
 
@@ -5,7 +5,8 @@ import warnings
 import itertools as it
 
 import cython
-# import cython.parallel
+from cython.parallel import prange
+from libc.math cimport NAN
 import numpy as np
 cimport numpy as np
 
@@ -201,53 +202,72 @@ def log_observation_probabilities(
                     logp += logImP[frame_row, j, chan]
             tmpLogP[i] += logp
 
-@cython.boundscheck(False)  # turn of bounds-checking for entire function
-def _align_frame(
-        np.ndarray[FLOAT_TYPE_t, ndim=4] frame,
-        np.ndarray[INT_TYPE_t, ndim=3] displacements,
-        corrected_frame_size):
-    """Correct a frame based on previously estimated displacements.
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def _align_frames(
+        np.ndarray[cython.floating, ndim=5] frames,
+        np.ndarray[INT_TYPE_t, ndim=4] displacements,
+        np.ndarray[cython.floating, ndim=5] out,
+        origin=(0, 0, 0)):
+    """Correct a block of frames based on row-wise displacements.
+
+    The frames are processed in parallel without the GIL.
 
     Parameters
     ----------
-    frame : array
-        Uncorrected imaging frame from each each channel.
+    frames : array
+        Uncorrected frames. Shape: (num_frames, num_planes, num_rows,
+        num_columns, num_channels).
     displacements : array
-        The displacements, adjusted so that (0,0) corresponds to the corner.
-        Shape: (num_planes, num_rows, 2).
-
-    Returns
-    -------
-    array : float32
-        The corrected frame, with unobserved locations indicated as NaN.
+        The displacements of each frame, adjusted so that (0,0) corresponds
+        to the corner. Shape: (num_frames, num_planes, num_rows, 2 or 3).
+    out : array
+        The array, of the same data type as frames, into which the corrected
+        frames are written. It represents the part of the corrected frames
+        starting at the (plane, row, column) origin. Unobserved locations
+        are set to NaN.
     """
-    cdef np.ndarray[FLOAT_TYPE_t, ndim=4] corrected_frame = np.zeros(
-        corrected_frame_size)
-    cdef np.ndarray[INT_TYPE_t, ndim=3] count = np.zeros(
-        corrected_frame_size[:-1], dtype=int)
-    cdef int num_cols, p, i, j, x, y, z, c, y_idx, x_idx
-    num_cols = frame.shape[2]
-    if displacements.shape[2] == 2:
+    cdef np.ndarray[np.int32_t, ndim=4] count = np.zeros(
+        (out.shape[0], out.shape[1], out.shape[2], out.shape[3]),
+        dtype='int32')
+    cdef Py_ssize_t n, p, i, j, c, x, y, z, num_cols, y_idx, x_idx
+    cdef Py_ssize_t z0 = origin[0], y0 = origin[1], x0 = origin[2]
+    num_cols = frames.shape[3]
+    if displacements.shape[3] == 2:
         y_idx = 0
         x_idx = 1
     else:
         y_idx = 1
         x_idx = 2
-    for p in range(frame.shape[0]):
-        for i in range(frame.shape[1]):
-            if y_idx == 1:
-                z = p + displacements[p, i, 0]
-            else:
-                z = p
-            y = i + displacements[p, i, y_idx]
-            for j in range(num_cols):
-                x = displacements[p, i, x_idx] + j
-                count[z, y, x] += 1
-                for c in range(frame.shape[3]):
-                    corrected_frame[z, y, x, c] += frame[p, i, j, c]
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        return (corrected_frame.T / count.T).T
+    out.fill(0)
+    with nogil:
+        for n in prange(frames.shape[0], schedule='static'):
+            for p in range(frames.shape[1]):
+                for i in range(frames.shape[2]):
+                    if y_idx == 1:
+                        z = p + displacements[n, p, i, 0] - z0
+                    else:
+                        z = p - z0
+                    y = i + displacements[n, p, i, y_idx] - y0
+                    if z < 0 or z >= out.shape[1] or y < 0 or \
+                            y >= out.shape[2]:
+                        continue
+                    for j in range(num_cols):
+                        x = displacements[n, p, i, x_idx] + j - x0
+                        if x < 0 or x >= out.shape[3]:
+                            continue
+                        count[n, z, y, x] += 1
+                        for c in range(frames.shape[4]):
+                            out[n, z, y, x, c] += frames[n, p, i, j, c]
+            for z in range(out.shape[1]):
+                for y in range(out.shape[2]):
+                    for x in range(out.shape[3]):
+                        for c in range(out.shape[4]):
+                            if count[n, z, y, x] == 0:
+                                out[n, z, y, x, c] = NAN
+                            else:
+                                out[n, z, y, x, c] /= count[n, z, y, x]
+
 
 def observation_counts(
         frame_shape,
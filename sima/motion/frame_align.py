@@ -15,7 +15,6 @@ try:
     from bottleneck import nanmean
 except ImportError:
     from numpy import nanmean
-import scipy.ndimage.filters
 
 from . import motion
 from sima.misc.align import align_cross_correlation
@@ -183,6 +182,7 @@ def _align_frame(inputs):
     """
 
     frame_idx, frame, cycle_idx, method, max_displacement = inputs
+    frame = np.asarray(frame, dtype=float)
     if max_displacement is not None:
         max_displacement = [0] + list(max_displacement)
 
@@ -344,7 +344,7 @@ class VolumeTranslation(motion.MotionEstimationStrategy):
         del self._params['self']
 
     def _estimate(self, dataset):
-        reference = next(iter(next(iter(dataset))))
+        reference = np.array(next(iter(next(iter(dataset)))), dtype=float)
         sums = np.zeros_like(reference)
         counts = np.zeros_like(reference)
         offset = np.zeros(3, dtype=int)
@@ -355,6 +355,7 @@ class VolumeTranslation(motion.MotionEstimationStrategy):
             seq_displacements = []
             seq_correlations = []
             for frame in sequence:
+                frame = np.asarray(frame, dtype=float)
                 if self._params['max_displacement'] is not None:
                     bounds = np.array([
                         np.minimum(
@@ -438,6 +439,7 @@ def pyr_down_3d(image, axes=None):
         The axes along which the downsampling is to occur.  Defaults to
         downsampling on all axes.
     """
+    import scipy.ndimage.filters
     stdevs = [1.05 if i in axes else 0 for i in range(image.ndim)]
     filtered_image = scipy.ndimage.filters.gaussian_filter(image, stdevs)
     slices = tuple(slice(None, None, 2) if i in axes else slice(None)
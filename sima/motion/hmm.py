@@ -11,19 +11,17 @@ import warnings
 import numpy as np
 from scipy.special import gammaln
 try:
-    from bottleneck import nansum, nanmedian
+    from bottleneck import nanmedian
 except ImportError:
-    from numpy import nansum
     try:
         from numpy import nanmedian
     except ImportError:
         from scipy.stats import nanmedian
 
-from scipy.stats.mstats import mquantiles
-
 from . import _motion as mc
 import sima.motion.frame_align
 import sima.misc
+from sima.misc.stats import FrameStatistics
 from sima.motion import MotionEstimationStrategy
 
 np.seterr(invalid='ignore', divide='ignore')
@@ -44,17 +42,13 @@ def _parse_granularity(granularity):
             'granularity must be of type str, int, or tuple of int')
 
 
-def _pixel_distribution(dataset, tolerance=0.001, min_frames=1000):
+def _pixel_distribution(dataset):
     """Estimate the distribution of pixel intensities for each channel.
 
-    Parameters
-    ----------
-    tolerance : float
-        The maximum relative error in the estimates that must be
-        achieved for termination.
-    min_frames: int
-        The minimum number of frames that must be evaluated before
-        termination.
+    The distribution is taken from the per-pixel statistics of the dataset
+    (see ImagingDataset.statistics), which are computed once and shared
+    with the other summaries of the dataset. Computing the statistics reads
+    every frame if they are not already saved with the dataset.
 
     Returns
     -------
@@ -64,23 +58,7 @@ def _pixel_distribution(dataset, tolerance=0.001, min_frames=1000):
         Variances of the intensity of each channel.
     """
     # TODO: separate distributions for each plane
-    sums = np.zeros(dataset.frame_shape[-1]).astype(float)
-    sum_squares = np.zeros_like(sums)
-    counts = np.zeros_like(sums)
-    t = 0
-    for frame in it.chain.from_iterable(dataset):
-        for plane in frame:
-            if t > 0:
-                mean_est = sums / counts
-                var_est = (sum_squares / counts) - (mean_est ** 2)
-            if t > min_frames and np.all(
-                    np.sqrt(var_est / counts) / mean_est < tolerance):
-                break
-            sums += np.nan_to_num(nansum(nansum(plane, axis=0), axis=0))
-            sum_squares += np.nan_to_num(
-                nansum(nansum(plane ** 2, axis=0), axis=0))
-            counts += np.isfinite(plane).sum(axis=0).sum(axis=0)
-            t += 1
+    mean_est, var_est = dataset.statistics.channel_distribution()
     assert np.all(mean_est > 0)
     assert np.all(var_est > 0)
     return mean_est, var_est
@@ -120,37 +98,25 @@ def _whole_frame_shifting(dataset, shifts):
             out_shape[i] += max_shifts[i] - min_shifts[i]
     else:
         raise Exception
-    reference = np.zeros(out_shape)
-    sum_squares = np.zeros_like(reference)
-    count = np.zeros_like(reference)
+    # The aligned frames are accumulated with the same NaN-aware, streaming
+    # statistics as the unaligned frames of the dataset.
+    statistics = FrameStatistics(tuple(out_shape))
     for frame, shift in zip(it.chain.from_iterable(dataset),
                             it.chain.from_iterable(shifts)):
         if shift.ndim == 1:  # single shift for the whole volume
             if any(x is np.ma.masked for x in shift):
                 continue
-            l = shift - min_shifts
-            h = shift + frame.shape[:-1]
-            reference[l[0]:h[0], l[1]:h[1], l[2]:h[2]] += np.nan_to_num(frame)
-            sum_squares[l[0]:h[0], l[1]:h[1], l[2]:h[2]] += np.nan_to_num(
-                frame ** 2)
-            count[l[0]:h[0], l[1]:h[1], l[2]:h[2]] += np.isfinite(frame)
+            statistics.update(frame[np.newaxis], tuple(shift - min_shifts))
         else:  # plane-specific shifts
-            for plane, p_shifts, ref, ssq, cnt in zip(
-                    frame, shift, reference, sum_squares, count):
+            for p, (plane, p_shifts) in enumerate(zip(frame, shift)):
                 if any(x is np.ma.masked for x in p_shifts):
                     continue
                 low = p_shifts - min_shifts  # TOOD: NaN considerations
-                high = low + plane.shape[:-1]
-                ref[low[0]:high[0], low[1]:high[1]] += np.nan_to_num(plane)
-                ssq[low[0]:high[0], low[1]:high[1]] += np.nan_to_num(
-                    plane ** 2)
-                cnt[low[0]:high[0], low[1]:high[1]] += np.isfinite(plane)
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        reference /= count
-        assert np.all(np.isnan(reference[np.equal(count, 0)]))
-        variances = (sum_squares / count) - reference ** 2
-        assert not np.any(variances < 0)
+                statistics.update(plane[np.newaxis, np.newaxis],
+                                  (p,) + tuple(low))
+    reference = statistics.mean
+    variances = statistics.variance
+    assert not np.any(variances < 0)
     return reference, variances
 
 
@@ -227,6 +193,7 @@ def _threshold_gradient(im):
         g_x = g_x.reshape([1, g_x.shape[0], g_x.shape[1]])
         g_y = g_y.reshape([1, g_y.shape[0], g_y.shape[1]])
     gradient_magnitudes = np.sqrt((g_x ** 2) + (g_y ** 2))
+    from scipy.stats.mstats import mquantiles
     below_threshold = []
     for chan in gradient_magnitudes:
         threshold = mquantiles(chan[np.isfinite(chan)].flatten(), [0.1])[0]
@@ -52,5 +52,27 @@ class Test_ResonantCorrection(object):
         assert_(np.diff(displacements[0][0, 0, :, -1])[0] == 5)
 
 
+def test_align_frames():
+    from sima.motion._motion import _align_frames
+    frames = np.random.rand(4, 2, 10, 12, 2)
+    displacements = np.random.randint(0, 3, (4, 2, 10, 3))
+    # reference: average the values mapped to each location
+    sums = np.zeros((4, 5, 13, 15, 2))
+    counts = np.zeros((4, 5, 13, 15, 1))
+    for n, p, i in np.ndindex(4, 2, 10):
+        z, y, x = displacements[n, p, i] + [p, i, 0]
+        sums[n, z, y, x:x + 12] += frames[n, p, i]
+        counts[n, z, y, x:x + 12] += 1
+    with np.errstate(invalid='ignore'):
+        expected = sums / counts
+    for dtype in ['float64', 'float32']:
+        out = np.empty((4, 5, 13, 15, 2), dtype=dtype)
+        _align_frames(frames.astype(dtype), displacements, out)
+        assert_allclose(out, expected, rtol=1e-5)
+        out = np.empty((4, 2, 9, 10, 2), dtype=dtype)
+        _align_frames(frames.astype(dtype), displacements, out, (1, 2, 3))
+        assert_allclose(out, expected[:, 1:3, 2:11, 3:13], rtol=1e-5)
+
+
 if __name__ == '__main__':
     run_module_suite()
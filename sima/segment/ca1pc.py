@@ -1,17 +1,10 @@
 from __future__ import division
 from builtins import range
-from distutils.version import LooseVersion
 
 import numpy as np
 from scipy import ndimage
 from scipy.ndimage import measurements
 from skimage.filter import threshold_otsu
-try:
-    import cv2
-except ImportError:
-    cv2_available = False
-else:
-    cv2_available = LooseVersion(cv2.__version__) >= LooseVersion('2.4.8')
 
 import sima.misc
 from .segment import (
@@ -105,7 +98,8 @@ class CA1PCNucleus(PostProcessingStep):
 
 def _clahe(image, x_tile_size=10, y_tile_size=10, clip_limit=20):
     """Perform contrast limited adaptive histogram equalization (CLAHE)."""
-    if not cv2_available:
+    cv2 = sima.misc.optional_import('cv2', '2.4.8')
+    if cv2 is None:
         raise ImportError('OpenCV >= 2.4.8 required')
     transform = cv2.createCLAHE(clipLimit=clip_limit,
                                 tileGridSize=(
@@ -117,7 +111,8 @@ def _clahe(image, x_tile_size=10, y_tile_size=10, clip_limit=20):
 def _unsharp_mask(image, mask_weight, image_weight=1.35, sigma_x=10,
                   sigma_y=10):
     """Perform unsharp masking on an image.."""
-    if not cv2_available:
+    cv2 = sima.misc.optional_import('cv2', '2.4.8')
+    if cv2 is None:
         raise ImportError('OpenCV >= 2.4.8 required')
     return cv2.addWeighted(
         sima.misc.to8bit(image), image_weight,
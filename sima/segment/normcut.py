@@ -13,7 +13,6 @@ from builtins import range
 from builtins import object
 from past.utils import old_div
 import os
-from distutils.version import LooseVersion
 import itertools as it
 import abc
 
@@ -29,13 +28,6 @@ from . import oPCA
 from . import _opca
 from future.utils import with_metaclass
 
-try:
-    import cv2
-except ImportError:
-    cv2_available = False
-else:
-    cv2_available = LooseVersion(cv2.__version__) >= LooseVersion('2.4.8')
-
 
 def normcut_vectors(affinity_matrix, k):
     """Return the normalized cut vectors.
@@ -130,7 +122,8 @@ class CutRegion(object):
         float
             The normalized cut cost.
         """
-        if not cv2_available:
+        cv2 = sima.misc.optional_import('cv2', '2.4.8')
+        if cv2 is None:
             raise ImportError('OpenCV >= 2.4.8 required')
         tmp_im = np.zeros(self.shape[0] * self.shape[1])
         tmp_im[self.indices] = 1
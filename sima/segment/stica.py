@@ -13,7 +13,6 @@ except ImportError:
 import sima.misc
 from .segment import SegmentationStrategy
 from . import oPCA
-from sklearn.decomposition import FastICA
 from sima.ROI import ROI, ROIList
 
 
@@ -81,6 +80,7 @@ def _stica(space_pcs, time_pcs, mu=0.01, n_components=30, path=None):
         time_pcs))
 
     # execute the FastICA algorithm
+    from sklearn.decomposition import FastICA
     ica = FastICA(n_components=n_components, max_iter=1500)
     st_components = np.real(np.array(ica.fit_transform(y)))
 
@@ -22,7 +22,7 @@ import matplotlib.path as mplPath
 from sima import ImagingDataset, Sequence, ROI
 from sima.misc import example_data, example_tiff
 from sima import segment
-from sima.segment.ca1pc import cv2_available
+from sima.misc import optional_import
 
 
 def setup():
@@ -64,7 +64,7 @@ def test_STICA():
     ds.segment(method)
 
 
-@dec.skipif(not cv2_available)
+@dec.skipif(optional_import('cv2', '2.4.8') is None)
 def test_PlaneNormalizedCuts():
     ds = ImagingDataset.load(example_data())[:, :, :, :50, :50]
     affinty_method = segment.BasicAffinityMatrix(num_pcs=5)
@@ -73,7 +73,7 @@ def test_PlaneNormalizedCuts():
     ds.segment(method)
 
 
-@dec.skipif(not cv2_available)
+@dec.skipif(optional_import('cv2', '2.4.8') is None)
 def test_PlaneCA1PC():
     ds = ImagingDataset.load(example_data())[:, :, :, :50, :50]
     method = segment.PlaneCA1PC(num_pcs=5)
@@ -36,12 +36,21 @@ from future.utils import with_metaclass
 # For convenience, we have created iterable objects that can be used with
 # common data formats.
 
+import bz2
+import collections
 import itertools as it
 import glob
+import json
+import os
+import re
+import struct
+import tempfile
+import threading
+import zlib
+from multiprocessing.pool import ThreadPool
 import warnings
-from distutils.version import StrictVersion
-from os.path import (abspath, dirname, join, normpath, normcase, isfile,
-                     relpath)
+from os.path import (abspath, basename, dirname, join, normpath, normcase,
+                     exists, relpath)
 from abc import ABCMeta, abstractmethod
 
 import numpy as np
@@ -55,19 +64,18 @@ except ImportError:
     def samefile(file1, file2):
         return stat(file1) == stat(file2)
 
-from PIL import Image
 try:
-    import h5py
-except ImportError:
-    h5py_available = False
-else:
-    h5py_available = StrictVersion(h5py.__version__) >= StrictVersion('2.2.1')
+    import lzma
+except ImportError:  # Python 2
+    lzma = None
 
 import sima.misc
-from sima.motion._motion import _align_frame
+from sima.motion._motion import _align_frames
 with warnings.catch_warnings():
     warnings.simplefilter("ignore")
-    from sima.misc.tifffile import TiffFileWriter
+    from sima.misc.tifffile import (
+        TiffFileWriter, TIFF_COMPESSIONS, TIFF_DATA_TYPES, TIFF_DECOMPESSORS,
+        imagej_description)
 
 
 class Sequence(with_metaclass(ABCMeta, object)):
@@ -143,6 +151,96 @@ class Sequence(with_metaclass(ABCMeta, object)):
         """
         raise NotImplementedError
 
+    def get_frames(self, start, stop):
+        """Get a block of consecutive frames.
+
+        Parameters
+        ----------
+        start, stop : int
+            The frames from start up to, but not including, stop are
+            returned. As with slicing, stop is clipped to the length of the
+            Sequence.
+
+        Returns
+        -------
+        frames : np.ndarray
+            The frames, with shape (num_frames, num_planes, num_rows,
+            num_columns, num_channels).
+
+        Examples
+        --------
+
+        >>> from sima import Sequence
+        >>> from sima.misc import example_hdf5
+        >>> path = example_hdf5()
+        >>> seq = Sequence.create('HDF5', path, 'yxt')
+        >>> seq.get_frames(5, 10).shape
+        (5, 1, 128, 256, 1)
+
+        """
+        start, stop = _clip_block(start, stop, len(self))
+        if start == stop:
+            return np.empty((0,) + self.shape[1:])
+        return np.array([self._get_frame(t) for t in range(start, stop)])
+
+    def iter_blocks(self, block_size=None):
+        """Iterate over the Sequence in blocks of consecutive frames.
+
+        Parameters
+        ----------
+        block_size : int, optional
+            The maximum number of frames in each block. By default, blocks
+            of approximately 64 MB of float64 data are used.
+
+        Yields
+        ------
+        frames : np.ndarray
+            Blocks of shape (num_frames, num_planes, num_rows, num_columns,
+            num_channels). See Sequence.get_frames.
+
+        Examples
+        --------
+
+        >>> from sima import Sequence
+        >>> from sima.misc import example_hdf5
+        >>> path = example_hdf5()
+        >>> seq = Sequence.create('HDF5', path, 'yxt')
+        >>> [block.shape[0] for block in seq.iter_blocks(8)]
+        [8, 8, 4]
+
+        """
+        num_frames = len(self)
+        if block_size is None:
+            block_size = _default_block_size(self.shape)
+        for start in range(0, num_frames, block_size):
+            yield self.get_frames(start, start + block_size)
+
+    def _get_indexed_frames(self, start, stop, indices):
+        """Get a block of consecutive frames restricted by frame indices.
+
+        Storage backends override this method so that data excluded by the
+        indices are not read.
+
+        Parameters
+        ----------
+        start, stop : int
+            See Sequence.get_frames.
+        indices : tuple
+            Indices into the (plane, row, column, channel) dimensions of the
+            frames.
+
+        Returns
+        -------
+        frames : np.ndarray
+            The selected data, which (except for views into memory-mapped
+            files) do not share memory with the unselected data.
+        """
+        frames = self.get_frames(start, stop)
+        if _expand_indices(indices) == (slice(None),) * 4:
+            return frames
+        frames = frames[(slice(None),) + indices]
+        return frames if isinstance(frames, np.memmap) else np.copy(frames)
+
     @abstractmethod
     def _todict(self, savedir=None):
         raise NotImplementedError
@@ -161,6 +259,38 @@ class Sequence(with_metaclass(ABCMeta, object)):
     def shape(self):
         return (len(self),) + self._get_frame(0).shape
 
+    def astype(self, dtype):
+        """Create a Sequence whose frames have a different data type.
+
+        The conversion is applied by the underlying data sources as the
+        frames are read, so that all subsequent processing operates on data
+        of the new type.
+
+        Parameters
+        ----------
+        dtype : data-type
+            The working data type of the frames, e.g. 'float32' to halve the
+            memory and bandwidth used compared with the default float64.
+
+        Returns
+        -------
+        sequence : sima.Sequence
+
+        Examples
+        --------
+
+        >>> from sima import Sequence
+        >>> from sima.misc import example_hdf5
+        >>> path = example_hdf5()
+        >>> seq = Sequence.create('HDF5', path, 'yxt').astype('float32')
+        >>> seq.get_frames(0, 5).dtype
+        dtype('float32')
+
+        """
+        d = self._todict()
+        _set_dtype(d, dtype)
+        return d.pop('__class__')._from_dict(d)
+
     def apply_displacements(self, displacements, frame_shape=None):
         return _MotionCorrectedSequence(self, displacements, frame_shape)
 
@@ -207,6 +337,105 @@ class Sequence(with_metaclass(ABCMeta, object)):
         """
         return _MaskedSequence(self, masks)
 
+    def cached(self, max_bytes, spill=False):
+        """Cache the frames of the sequence for repeated passes.
+
+        Frames are kept in memory in least-recently-used order up to a
+        total size of max_bytes, so that repeated iteration does not
+        re-decode, re-align or re-mask the frames. The cached frames are
+        read-only.
+
+        Parameters
+        ----------
+        max_bytes : int
+            The maximum size in bytes of the frames kept in memory.
+        spill : bool, optional
+            If True, frames evicted from memory are written to a temporary
+            memory-mapped file rather than discarded, so that no frame is
+            computed more than once. Default: False.
+
+        Returns
+        -------
+        sequence : sima.Sequence
+
+        Examples
+        --------
+
+        >>> from sima import Sequence
+        >>> from sima.misc import example_hdf5
+        >>> path = example_hdf5()
+        >>> seq = Sequence.create('HDF5', path, 'yxt').cached(2 ** 20)
+        >>> time_avg = np.mean([frame for frame in seq], axis=0)
+        >>> time_max = np.max([frame for frame in seq], axis=0)
+
+        """
+        return _CachedSequence(self, max_bytes, spill)
+
+    def prefetch(self, depth=4, workers=None):
+        """Read upcoming frames in background threads during iteration.
+
+        While the frames already read are being processed, the following
+        frames are read, decoded and aligned by a pool of threads, so that
+        disk access and computation overlap. Frames are yielded in order.
+
+        Parameters
+        ----------
+        depth : int, optional
+            The maximum number of frames (or blocks, for iter_blocks) read
+            ahead of the frame being processed. Default: 4.
+        workers : int, optional
+            The number of threads. Defaults to the number of CPUs.
+
+        Returns
+        -------
+        sequence : sima.Sequence
+
+        Examples
+        --------
+
+        >>> from sima import Sequence
+        >>> from sima.misc import example_hdf5
+        >>> path = example_hdf5()
+        >>> seq = Sequence.create('HDF5', path, 'yxt').prefetch(depth=8)
+        >>> time_avg = np.mean([frame for frame in seq], axis=0)
+
+        """
+        return _PrefetchSequence(self, depth, workers)
+
+    def bin(self, t=1, y=1, x=1):
+        """Average blocks of frames and of pixels.
+
+        The binned frames are computed when they are read, from blocks of
+        frames of the sequence. Missing values (NaN) are excluded from the
+        averages, and bins without any values are NaN. Incomplete bins at
+        the end of the sequence and at the edges of the frames are averaged
+        over the frames and pixels they contain.
+
+        Parameters
+        ----------
+        t : int, optional
+            The number of consecutive frames averaged together. Default: 1.
+        y, x : int, optional
+            The number of rows and columns, respectively, of the blocks of
+            pixels averaged together. Default: 1.
+
+        Returns
+        -------
+        sequence : sima.Sequence
+
+        Examples
+        --------
+
+        >>> from sima import Sequence
+        >>> from sima.misc import example_hdf5
+        >>> path = example_hdf5()
+        >>> seq = Sequence.create('HDF5', path, 'yxt')
+        >>> seq.bin(t=4, y=2, x=2).shape
+        (5, 1, 64, 128, 1)
+
+        """
+        return _BinnedSequence(self, t, y, x)
+
     @staticmethod
     def join(*sequences):
         """Join together sequences representing different channels.
@@ -243,12 +472,17 @@ class Sequence(with_metaclass(ABCMeta, object)):
 
         Parameters
         ----------
-        fmt : {'HDF5', 'TIFF', 'TIFFs', 'ndarray'}
+        fmt : {'HDF5', 'TIFF', 'TIFFs', 'TIFF stack', 'chunked', 'ndarray',
+               'npy', 'raw'}
             The format of the data used to create the Sequence.
         *args
         **kwargs
             Additional arguments depending on the data format. See
             Notes below.
+        dtype : data-type, optional
+            The data type of the frames. Defaults to float64, except for
+            memory-mapped npy and raw files (see below). Use 'float32'
+            to halve the memory used by each frame.
 
         Notes
         -----
@@ -305,6 +539,11 @@ class Sequence(with_metaclass(ABCMeta, object)):
         num_channels : int, optional
             The number of interleaved channels. Default: 1.
 
+        Uncompressed TIFF files whose pages are evenly spaced in the file are
+        memory-mapped. Other TIFF files are decoded page by page. With
+        dtype=None, frames of memory-mapped files are read-only views into
+        the file with the stored data type rather than float64 copies.
+
         Warning
         -------
         Moving the TIFF file may make this Sequence unusable
@@ -320,6 +559,9 @@ class Sequence(with_metaclass(ABCMeta, object)):
             filenames for plane i and channel j. See
             `glob <https://docs.python.org/2/library/glob.html>`_ for
             details on how to format such a string.
+        workers : int, optional
+            The number of threads used to read the files in parallel.
+            Defaults to the number of CPUs.
 
         >>> from sima import Sequence
         >>> seq = Sequence.create('TIFFs', [['example/example_??.tif']])
@@ -333,21 +575,117 @@ class Sequence(with_metaclass(ABCMeta, object)):
         such that they retain the same relative position.
 
 
+        **TIFF stack**
+
+        paths : str or list of str
+            The multipage TIFF files into which a recording has been split,
+            in order, or a unix style expression for their filenames, which
+            are sorted.
+        num_planes : int, optional
+            The number of interleaved planes. Default: 1.
+        num_channels : int, optional
+            The number of interleaved channels. Default: 1.
+
+        The pages of the files are treated as a single stack of
+        interleaved pages, so that frames can continue from one file into
+        the next. The files must be readable page by page, e.g.
+        uncompressed or compressed with deflate, LZW or PackBits.
+
+        Warning
+        -------
+        Moving the TIFF files may make this Sequence unusable
+        when the ImagingDataset is reloaded. The TIFF files can
+        only be moved if the ImagingDataset path is also moved
+        such that they retain the same relative position.
+
+
+        **chunked**
+
+        path : str
+            The directory of a chunked store, as written by
+            Sequence.export with fmt='chunked'.
+        workers : int, optional
+            The number of threads used to decompress the chunks in
+            parallel. Defaults to the number of CPUs.
+
+        The store holds the frames in fixed-size chunks over the (time,
+        plane, row, column, channel) dimensions, each compressed in its own
+        file, and a JSON header describing them. Only the chunks that
+        overlap the requested frames are read.
+
+        Warning
+        -------
+        Moving the store may make this Sequence unusable when the
+        ImagingDataset is reloaded. The store can only be moved if the
+        ImagingDataset path is also moved such that they retain the same
+        relative position.
+
+
         **ndarray**
 
         array : numpy.ndarray
             A numpy array of shape (num_frames, num_planes, num_rows,
             num_columns, num_channels)
 
+
+        **npy**
+
+        path : str
+            The path to a .npy file, as written by numpy.save, of an array of
+            shape (num_frames, num_planes, num_rows, num_columns,
+            num_channels).
+
+        The file is memory-mapped, so that unless a dtype is given, frames
+        are read-only views into the file with the stored data type.
+
+
+        **raw**
+
+        path : str
+            The path to a file of raw binary data, in C order.
+        shape : tuple of int
+            The shape (num_frames, num_planes, num_rows, num_columns,
+            num_channels) of the data. If num_frames is None, it is inferred
+            from the size of the file.
+        file_dtype : data-type
+            The data type of the stored data, including its byte order.
+        offset : int, optional
+            The number of bytes before the data in the file. Default: 0.
+
+        As with npy files, the data are memory-mapped.
+
+        Warning
+        -------
+        Moving the npy or raw file may make this Sequence unusable when the
+        ImagingDataset is reloaded. The file can only be moved if the
+        ImagingDataset path is also moved such that they retain the same
+        relative position.
+
         """
         if fmt == 'HDF5':
             return _Sequence_HDF5(*args, **kwargs)
         elif fmt == 'TIFF':
-            return _Sequence_TIFF_Interleaved(*args, **kwargs)
+            # the file is indexed once, whether or not it can be mapped
+            sequence = _Sequence_TIFF_Interleaved(*args, **kwargs)
+            try:
+                return _Sequence_TIFF_Memmap(
+                    sequence._path, sequence._num_planes,
+                    sequence._num_channels, sequence._len,
+                    sequence._get_page_index(), sequence._dtype)
+            except ValueError:
+                return sequence
         elif fmt == 'TIFFs':
             return _Sequence_TIFFs(*args, **kwargs)
+        elif fmt == 'TIFF stack':
+            return _Sequence_TIFF_Stack(*args, **kwargs)
+        elif fmt == 'chunked':
+            return _Sequence_Chunked(*args, **kwargs)
         elif fmt == 'ndarray':
             return _Sequence_ndarray(*args, **kwargs)
+        elif fmt == 'npy':
+            return _Sequence_NPY(*args, **kwargs)
+        elif fmt == 'raw':
+            return _Sequence_raw(*args, **kwargs)
         else:
             raise ValueError('Unrecognized format')
 
@@ -365,7 +703,7 @@ class Sequence(with_metaclass(ABCMeta, object)):
         return np.concatenate([np.expand_dims(frame, 0) for frame in self])
 
     def export(self, filenames, fmt='TIFF16', fill_gaps=False,
-               channel_names=None):
+               channel_names=None, compression=None, chunks=None):
         """Save frames to the indicated filenames.
 
         This function stores a multipage tiff file for each channel.
@@ -373,25 +711,43 @@ class Sequence(with_metaclass(ABCMeta, object)):
         Parameters
         ----------
         filenames : str or list of list str
-            The names of the output files. For HDF5 files, this must be a
-            single string. For TIFF formats, this should be a list of list
-            of strings, such that filenames[i][j] corresponds to the ith
-            plane and the jth channel.
-        fmt : {'HDF5', 'TIFF16', 'TIFF8'}
-            The output file format.
+            The names of the output files. For HDF5 files and chunked
+            stores, this must be a single string. For TIFF formats, this
+            should be a list of list of strings, such that filenames[i][j]
+            corresponds to the ith plane and the jth channel.
+        fmt : {'HDF5', 'TIFF16', 'TIFF8', 'chunked'}
+            The output file format. Chunked stores (see Sequence.create)
+            keep the data type of the frames, including missing values, so
+            that they can be used in place of the sequence.
         fill_gaps : bool, optional
             Whether to fill in missing data with pixel intensities from
             adjacent frames. Default: False.
         channel_names : list of str, optional
             List of labels for the channels to be saved if using HDF5 format.
+        compression : str, optional
+            The compression filter of the HDF5 dataset, one of {None, 'gzip',
+            'lzf'}, or of the chunks of a chunked store, one of {None,
+            'zlib', 'bz2', 'lzma'}. Default: None.
+        chunks : tuple of int, optional
+            The chunk shape of the HDF5 dataset or chunked store, in order
+            (num_frames, num_planes, num_rows, num_columns, num_channels).
+            Defaults to chunks of a single frame for HDF5 files, and to
+            chunks of whole frames of about 1 MB for chunked stores.
+
+        Notes
+        -----
+        The frames are written in blocks as they are read, so that the
+        sequence is never held in memory as a whole. The TIFF files of the
+        different planes and channels are written concurrently, in the
+        BigTIFF format if they may exceed 4 GB.
         """
-        if fmt not in ['TIFF8', 'TIFF16', 'HDF5']:
+        if fmt not in ['TIFF8', 'TIFF16', 'HDF5', 'chunked']:
             raise ValueError('Unrecognized output format.')
         if (fmt in ['TIFF16', 'TIFF8']) and not np.array(filenames).ndim == 2:
             raise TypeError('Improperly formatted filenames')
 
         # Make directories necessary for saving the files.
-        try:  # HDF5 case
+        try:  # HDF5 and chunked case
             out_dirs = [[dirname(filenames)]]
         except (AttributeError, TypeError):  # TIFF case
             out_dirs = [[dirname(f) for f in plane] for plane in filenames]
@@ -399,42 +755,70 @@ class Sequence(with_metaclass(ABCMeta, object)):
             sima.misc.mkdir_p(d)
 
         if 'TIFF' in fmt:
-            output_files = [[TiffFileWriter(fn) for fn in plane]
-                            for plane in filenames]
+            tiff_dtype = np.dtype('uint16' if fmt == 'TIFF16' else 'uint8')
+            # allow for the IFD of each page when estimating the file size
+            file_size = len(self) * (
+                int(np.prod(self.shape[2:4])) * tiff_dtype.itemsize + 1024)
+            output_files = [[TiffFileWriter(fn, bigtiff=file_size >= 2**32)
+                             for fn in plane] for plane in filenames]
+            pool = ThreadPool(len(output_files) * len(output_files[0]))
         elif fmt == 'HDF5':
-            if not h5py_available:
+            h5py = sima.misc.optional_import('h5py', '2.2.1')
+            if h5py is None:
                 raise ImportError('h5py >= 2.2.1 required')
+            frame_shape = self.shape[1:]
             f = h5py.File(filenames, 'w')
-            output_array = np.empty(self.shape, dtype='uint16')
-            # TODO: change dtype?
+            output_array = f.create_dataset(
+                name='imaging', shape=(0,) + frame_shape,
+                maxshape=(None,) + frame_shape, dtype='uint16',
+                chunks=(1,) + frame_shape if chunks is None else chunks,
+                compression=compression)
+            for idx, label in enumerate(['t', 'z', 'y', 'x', 'c']):
+                output_array.dims[idx].label = label
+            if channel_names is not None:
+                # fixed-length byte strings, as written under Python 2
+                output_array.attrs['channel_names'] = np.array(
+                    channel_names, dtype='S')
+        elif fmt == 'chunked':
+            output_store = None
 
+        block_size = _default_block_size(self.shape)
         if fill_gaps:
-            save_frames = _fill_gaps(iter(self), iter(self))
+            save_blocks = _iter_blocks(_fill_gaps(self, block_size),
+                                       block_size)
         else:
-            save_frames = iter(self)
-        for f_idx, frame in enumerate(save_frames):
+            save_blocks = self.iter_blocks(block_size)
+        for frames in save_blocks:
             if fmt == 'HDF5':
-                output_array[f_idx] = frame
-            else:
-                for plane_idx, plane in enumerate(frame):
-                    for ch_idx, channel in enumerate(np.rollaxis(plane, -1)):
-                        f = output_files[plane_idx][ch_idx]
-                        if fmt == 'TIFF16':
-                            f.write_page(channel.astype('uint16'))
-                        elif fmt == 'TIFF8':
-                            f.write_page(channel.astype('uint8'))
-                        else:
-                            raise ValueError('Unrecognized output format.')
+                num_frames = len(output_array)
+                output_array.resize(num_frames + len(frames), axis=0)
+                output_array[num_frames:] = frames.astype('uint16')
+                continue
+            if fmt == 'chunked':
+                if output_store is None:
+                    output_store = _ChunkedWriter(
+                        filenames, self.shape[1:], frames.dtype, chunks,
+                        compression, channel_names)
+                output_store.write(frames)
+                continue
+            # the files of the planes and channels are written concurrently
+            pool.map(
+                lambda args: _write_tiff_pages(args[0], args[1], tiff_dtype),
+                [(f, frames[:, plane_idx, :, :, ch_idx])
+                 for plane_idx, plane_files in enumerate(output_files)
+                 for ch_idx, f in enumerate(plane_files)])
         if 'TIFF' in fmt:
+            pool.close()
             for f in it.chain.from_iterable(output_files):
                 f.close()
         elif fmt == 'HDF5':
-            f.create_dataset(name='imaging', data=output_array)
-            for idx, label in enumerate(['t', 'z', 'y', 'x', 'c']):
-                f['imaging'].dims[idx].label = label
-            if channel_names is not None:
-                f['imaging'].attrs['channel_names'] = np.array(channel_names)
             f.close()
+        elif fmt == 'chunked':
+            if output_store is None:  # empty sequence
+                output_store = _ChunkedWriter(
+                    filenames, self.shape[1:], float, chunks, compression,
+                    channel_names)
+            output_store.close()
 
 
 class _Sequence_TIFF_Interleaved(Sequence):
@@ -453,33 +837,65 @@ class _Sequence_TIFF_Interleaved(Sequence):
 
     """
 
-    def __init__(self, path, num_planes=1, num_channels=1, len_=None):
+    def __init__(self, path, num_planes=1, num_channels=1, len_=None,
+                 page_index=None, dtype=float):
         self._num_planes = num_planes
         self._num_channels = num_channels
         self._path = abspath(path)
         self._len = len_
+        self._dtype = _as_dtype(dtype)
+        self._page_index = page_index
+        self._page_index_checked = False
+
+    def _get_page_index(self):
+        """Return the page index, rebuilding it if the file has changed."""
+        if not self._page_index_checked:
+            index = _tiff_page_index(self._path, self._page_index)
+            if index is not self._page_index:
+                self._len = None  # the cached length may be stale
+            self._page_index = index
+            self._page_index_checked = True
+        return self._page_index
 
     def __iter__(self):
         base_iter = self._iter_pages()
         while True:
-            yield np.concatenate(
-                [np.expand_dims(
-                    np.concatenate(
-                        [np.expand_dims(next(base_iter), 2).astype(float)
-                         for _ in range(self._num_channels)],
-                        axis=2), 0)
-                 for _ in range(self._num_planes)], 0)
+            try:
+                yield _astype(np.concatenate(
+                    [np.expand_dims(
+                        np.concatenate(
+                            [np.expand_dims(next(base_iter), 2)
+                             for _ in range(self._num_channels)],
+                            axis=2), 0)
+                     for _ in range(self._num_planes)], 0), self._dtype)
+            except StopIteration:
+                return
 
     def _get_frame(self, n):
+        index = self._get_page_index()
+        first_page = n * self._num_planes * self._num_channels
+        if index['offsets'] is not None:
+            if first_page < 0 or first_page + self._num_planes * \
+                    self._num_channels > len(index['offsets']):
+                raise IndexError('Frame index out of range')
+            with open(self._path, 'rb') as fh:
+                pages = [_read_tiff_page(fh, index, first_page + i)
+                         for i in range(self._num_planes *
+                                        self._num_channels)]
+            return _astype(_deinterleave(
+                np.array(pages), self._num_planes, self._num_channels)[0],
+                self._dtype)
+
+        from PIL import Image
         images = Image.open(self._path, 'r')
 
         def _get_im(n, p, c):
             """Get the image corresponding to time n, plane p, channel c"""
             images.seek(n * self._num_planes * self._num_channels +
                         p * self._num_channels + c)
-            return np.array(images).astype(float)
+            return np.array(images)
 
-        images.seek(n * self._num_planes * self._num_channels)
+        images.seek(first_page)
         frame = np.concatenate(
             [np.expand_dims(
                 np.concatenate(
@@ -488,10 +904,57 @@ class _Sequence_TIFF_Interleaved(Sequence):
                     axis=2), 0)
              for p in range(self._num_planes)], 0)
         images.close()
-        return frame
+        return _astype(frame, self._dtype)
+
+    def get_frames(self, start, stop):
+        index = self._get_page_index()
+        if index['offsets'] is None:
+            return super(_Sequence_TIFF_Interleaved, self).get_frames(
+                start, stop)
+        start, stop = _clip_block(start, stop, len(self))
+        pages_per_frame = self._num_planes * self._num_channels
+        with open(self._path, 'rb') as fh:
+            pages = _read_tiff_pages(fh, index, start * pages_per_frame,
+                                     stop * pages_per_frame)
+        return _astype(
+            _deinterleave(pages, self._num_planes, self._num_channels),
+            self._dtype)
+
+    def _get_indexed_frames(self, start, stop, indices):
+        """Read only the pages of the selected planes and channels, and only
+        the strips containing the selected rows."""
+        index = self._get_page_index()
+        planes, rows, columns, channels = _expand_indices(indices)
+        if index['offsets'] is None or not all(
+                isinstance(i, slice) for i in (planes, rows, channels)):
+            return super(_Sequence_TIFF_Interleaved, self)._get_indexed_frames(
+                start, stop, indices)
+        start, stop = _clip_block(start, stop, len(self))
+        planes = range(self._num_planes)[planes]
+        channels = range(self._num_channels)[channels]
+        rows = range(index['shape'][0])[rows]
+        frames = np.empty(
+            (stop - start, len(planes), len(rows), index['shape'][1],
+             len(channels)), dtype=index['dtype'])
+        pages_per_frame = self._num_planes * self._num_channels
+        with open(self._path, 'rb') as fh:
+            for i, t in enumerate(range(start, stop)):
+                for j, p in enumerate(planes):
+                    for k, c in enumerate(channels):
+                        frames[i, j, :, :, k] = _read_tiff_page(
+                            fh, index, t * pages_per_frame +
+                            p * self._num_channels + c, rows)
+        return _astype(frames[:, :, :, columns], self._dtype)
 
     def _iter_pages(self):
+        index = self._get_page_index()
+        if index['offsets'] is not None:
+            with open(self._path, 'rb') as fh:
+                for page in range(len(index['offsets'])):
+                    yield _read_tiff_page(fh, index, page)
+            return
         idx = 0
+        from PIL import Image
         images = Image.open(self._path, 'r')
         while True:
             try:
@@ -500,14 +963,16 @@ class _Sequence_TIFF_Interleaved(Sequence):
                 break
             else:
                 idx += 1
-                yield np.array(images).astype(float)
+                yield np.array(images)
         images.close()
 
     def _todict(self, savedir=None):
         d = {'__class__': self.__class__,
              'num_planes': self._num_planes,
              'num_channels': self._num_channels,
-             'len_': self._len}
+             'len_': self._len,
+             'page_index': self._page_index,
+             'dtype': self._dtype}
         if savedir is None:
             d.update({'path': abspath(self._path)})
         else:
@@ -517,128 +982,872 @@ class _Sequence_TIFF_Interleaved(Sequence):
 
     def __len__(self):
         if self._len is None:
-            self._len = sum(1 for _ in self)
+            self._len = self._get_page_index()['num_pages'] // (
+                self._num_planes * self._num_channels)
         return self._len
 
+    @property
+    def shape(self):
+        index = self._get_page_index()
+        if index['offsets'] is None:
+            return super(_Sequence_TIFF_Interleaved, self).shape
+        return (len(self), self._num_planes) + index['shape'] + \
+            (self._num_channels,)
+
 
-class _Sequence_TIFFs(Sequence):
+class _Sequence_TIFF_Memmap(_Sequence_TIFF_Interleaved):
 
-    """
+    """Memory-mapped sequence for uncompressed multipage TIFF files.
 
-    Parameters
-    ----------
-    paths : list of list of str
-        The string paths[i][j] is a unix style expression for the the
-        filenames for plane i and channel j. See glob for details.
+    Frames are converted to the given dtype, float64 by default.  With
+    dtype=None, frames, iteration and slicing return read-only views into
+    the file rather than decoded copies, so the frames have the data type
+    stored in the file.  A ValueError is raised if the file cannot be
+    memory-mapped.
+
+    See sima.Sequence.create() for details.
     """
 
-    def __init__(self, paths):
-        if isinstance(paths, np.ndarray):  # special case: loading saved data
-            assert paths.ndim == 3
-            self._paths = paths
-        else:
-            if not isinstance(paths, list):
-                raise ValueError('paths must be a list of list of str')
-            if not all(isinstance(p, list) for p in paths):
-                raise ValueError('paths must be a list of list of str')
-            # save paths as an array of shape (frames, planes, channels)
-            self._paths = np.array(
-                [[sorted(glob.glob(channel))
-                  if isinstance(channel, str) else channel
-                  for channel in plane] for plane in paths]
-            ).reshape(-1, len(paths), len(paths[0]))
+    def __init__(self, path, num_planes=1, num_channels=1, len_=None,
+                 page_index=None, dtype=float):
+        super(_Sequence_TIFF_Memmap, self).__init__(
+            path, num_planes, num_channels, len_, page_index, dtype)
+        self._array = _memmap_tiff(self._path, self._get_page_index(),
+                                   num_planes, num_channels)
+        self._len = len(self._array)
 
-    def __len__(self):
-        return len(self._paths)
+    def __iter__(self):
+        for frame in self._array:
+            yield _astype(frame, self._dtype)
 
-    def _get_frame(self, t):
+    def _get_frame(self, n):
+        return _astype(self._array[n], self._dtype)
 
-        def arange_channels(plane):
+    def get_frames(self, start, stop):
+        start, stop = _clip_block(start, stop, len(self))
+        return _astype(self._array[start:stop], self._dtype)
 
-            def unpack(p):
-                images = Image.open(p, 'r')
-                idx = 0
-                while True:
-                    try:
-                        images.seek(idx)
-                    except EOFError:
-                        break
-                    else:
-                        idx += 1
-                        yield np.array(images)
-                images.close()
+    def _get_indexed_frames(self, start, stop, indices):
+        start, stop = _clip_block(start, stop, len(self))
+        return _astype(self._array[(slice(start, stop),) + indices],
+                       self._dtype)
 
-            return np.concatenate([np.concatenate(
-                [np.expand_dims(a, 2) for a in unpack(path)],
-                axis=2).astype(float) for path in plane], axis=2)
+    def __len__(self):
+        return len(self._array)
 
-        return np.concatenate(
-            [np.expand_dims(arange_channels(plane), 0)
-             for plane in self._paths[t]], 0)
 
-    # TODO: Efficient slicing mechanism
-    # def __getitem__(self, indices):
+class _Sequence_TIFF_Stack(Sequence):
 
-    def _todict(self, savedir=None):
-        return {'__class__': self.__class__, 'paths': self._paths}
+    """Sequence for frames continuing across consecutive multipage TIFF files.
 
+    See sima.Sequence.create() for details.
 
-class _Sequence_ndarray(Sequence):
+    Parameters
+    ----------
+    paths : str or list of str
+        The TIFF files, in order, or a unix style expression for their
+        filenames, which are sorted.
+    num_planes : int, optional
+        The number of interleaved planes. Default: 1.
+    num_channels : int, optional
+        The number of interleaved channels. Default: 1.
+    page_indices : list of dict, optional
+        Previously built page indices of the files, see _tiff_page_index.
+    dtype : data-type, optional
+        The data type of the frames. Default: float64.
+
+    The pages of the files are numbered consecutively, so that frames may
+    span two files. The page index of each file is built once, together
+    with the number of the first page of each file, which locates any page
+    by a binary search over the file boundaries.
+    """
 
-    def __init__(self, array):
-        self._array = array
+    def __init__(self, paths, num_planes=1, num_channels=1,
+                 page_indices=None, dtype=float):
+        if isinstance(paths, str):
+            pattern = paths
+            paths = sorted(glob.glob(pattern))
+            if not len(paths):
+                raise ValueError('No files match ' + pattern)
+        self._paths = [abspath(p) for p in paths]
+        self._num_planes = num_planes
+        self._num_channels = num_channels
+        self._page_indices = page_indices
+        self._dtype = _as_dtype(dtype)
+        self._first_pages = None
+
+    def _get_page_indices(self):
+        """Return the page indices of the files and the number of the first
+        page of each file, rebuilding the indices of changed files."""
+        if self._first_pages is None:
+            indices = [_tiff_page_index(path, index) for path, index in zip(
+                self._paths, self._page_indices or [None] * len(self._paths))]
+            for path, index in zip(self._paths, indices):
+                if index['offsets'] is None:
+                    raise ValueError(
+                        'The pages of %s cannot be read directly' % path)
+                if (index['shape'], index['dtype']) != \
+                        (indices[0]['shape'], indices[0]['dtype']):
+                    raise ValueError('All files must contain pages of the '
+                                     'same shape and data type')
+            self._page_indices = indices
+            self._first_pages = np.cumsum(
+                [0] + [len(index['offsets']) for index in indices])
+        return self._page_indices, self._first_pages
+
+    def _locate(self, page):
+        """Return the file number and page number in the file of a page."""
+        first_pages = self._get_page_indices()[1]
+        f = np.searchsorted(first_pages, page, 'right') - 1
+        return f, page - first_pages[f]
+
+    def _read_pages(self, start, stop):
+        """Read consecutive pages, which may span several files."""
+        indices, first_pages = self._get_page_indices()
+        pages = np.empty((stop - start,) + indices[0]['shape'],
+                         dtype=indices[0]['dtype'])
+        f = self._locate(start)[0] if stop > start else len(indices)
+        while f < len(indices) and first_pages[f] < stop:
+            low = max(start, first_pages[f])
+            high = min(stop, first_pages[f + 1])
+            with open(self._paths[f], 'rb') as fh:
+                pages[low - start:high - start] = _read_tiff_pages(
+                    fh, indices[f], low - first_pages[f],
+                    high - first_pages[f])
+            f += 1
+        return pages
 
     def __len__(self):
-        return len(self._array)
+        return self._get_page_indices()[1][-1] // (
+            self._num_planes * self._num_channels)
+
+    @property
+    def shape(self):
+        return (len(self), self._num_planes) + \
+            tuple(self._get_page_indices()[0][0]['shape']) + \
+            (self._num_channels,)
+
+    def __iter__(self):
+        for frames in self.iter_blocks():
+            for frame in frames:
+                yield frame
 
     def _get_frame(self, t):
-        return self._array[t].astype(float)
+        if not 0 <= t < len(self):
+            raise IndexError('Frame index out of range')
+        return self.get_frames(t, t + 1)[0]
+
+    def get_frames(self, start, stop):
+        start, stop = _clip_block(start, stop, len(self))
+        pages_per_frame = self._num_planes * self._num_channels
+        return _astype(_deinterleave(
+            self._read_pages(start * pages_per_frame, stop * pages_per_frame),
+            self._num_planes, self._num_channels), self._dtype)
+
+    def _get_indexed_frames(self, start, stop, indices):
+        """Read only the pages of the selected planes and channels, and only
+        the strips containing the selected rows."""
+        planes, rows, columns, channels = _expand_indices(indices)
+        if not all(isinstance(i, slice) for i in (planes, rows, channels)):
+            return super(_Sequence_TIFF_Stack, self)._get_indexed_frames(
+                start, stop, indices)
+        page_indices = self._get_page_indices()[0]
+        start, stop = _clip_block(start, stop, len(self))
+        planes = range(self._num_planes)[planes]
+        channels = range(self._num_channels)[channels]
+        rows = range(page_indices[0]['shape'][0])[rows]
+        frames = np.empty(
+            (stop - start, len(planes), len(rows),
+             page_indices[0]['shape'][1], len(channels)),
+            dtype=page_indices[0]['dtype'])
+        pages_per_frame = self._num_planes * self._num_channels
+        files = {}
+        try:
+            for i, t in enumerate(range(start, stop)):
+                for j, p in enumerate(planes):
+                    for k, c in enumerate(channels):
+                        f, page = self._locate(
+                            t * pages_per_frame + p * self._num_channels + c)
+                        if f not in files:
+                            files[f] = open(self._paths[f], 'rb')
+                        frames[i, j, :, :, k] = _read_tiff_page(
+                            files[f], page_indices[f], page, rows)
+        finally:
+            for fh in files.values():
+                fh.close()
+        return _astype(frames[:, :, :, columns], self._dtype)
 
     def _todict(self, savedir=None):
-        return {'__class__': self.__class__, 'array': self._array}
+        d = {'__class__': self.__class__,
+             'num_planes': self._num_planes,
+             'num_channels': self._num_channels,
+             'page_indices': self._page_indices,
+             'dtype': self._dtype}
+        if savedir is None:
+            d.update({'paths': self._paths})
+        else:
+            d.update({'_abspaths': self._paths,
+                      '_relpaths': [relpath(p, savedir) for p in self._paths]})
+        return d
 
+    @classmethod
+    def _from_dict(cls, d, savedir=None):
+        if savedir is not None:
+            paths = []
+            for abs_path, rel_path in zip(d.pop('_abspaths'),
+                                          d.pop('_relpaths')):
+                path = {'_abspath': abs_path, '_relpath': rel_path}
+                _resolve_paths(path, savedir)
+                paths.append(path['path'])
+            d['paths'] = paths
+        return cls(**d)
 
-class _Sequence_HDF5(Sequence):
 
-    """
-    Iterable for an HDF5 file containing imaging data.
+def _deinterleave(pages, num_planes, num_channels):
+    """Arrange interleaved pages as frames of shape (num_planes, num_rows,
+    num_columns, num_channels)."""
+    return pages.reshape((-1, num_planes, num_channels) + pages.shape[1:]
+                         ).transpose(0, 1, 3, 4, 2)
 
-    See sima.Sequence.create() for details.
-    """
 
-    def __init__(self, path, dim_order, group=None, key=None):
-        if not h5py_available:
-            raise ImportError('h5py >= 2.2.1 required')
-        self._path = abspath(path)
-        self._file = h5py.File(path, 'r')
-        if group is None:
-            group = '/'
-        self._group = self._file[group]
-        if key is None:
-            if len(list(self._group.keys())) != 1:
-                raise ValueError(
-                    'key must be provided to resolve ambiguity.')
-            key = list(self._group.keys())[0]
-        self._key = key
-        self._dataset = self._group[key]
-        if len(dim_order) != len(self._dataset.shape):
-            raise ValueError(
-                'dim_order must have same length as the number of ' +
-                'dimensions in the HDF5 dataset.')
-        self._T_DIM = dim_order.find('t')
-        self._Z_DIM = dim_order.find('z')
-        self._Y_DIM = dim_order.find('y')
-        self._X_DIM = dim_order.find('x')
-        self._C_DIM = dim_order.find('c')
-        self._dim_order = dim_order
+def _tiff_page_index(path, index=None):
+    """Index the locations of the image data in a TIFF file.
 
-    def __del__(self):
-        self._file.close()
+    The index is built from the image file directories (IFDs) alone,
+    without reading any pixel data, so that each page can subsequently be
+    read with a single seek and read per strip.  A previously built index is
+    returned unchanged if the size and modification time of the file match.
 
-    def __len__(self):
-        return self._dataset.shape[self._T_DIM]
-        # indices = self._time_slice.indices(self._dataset.shape[self._T_DIM])
-        # return (indices[1] - indices[0] + indices[2] - 1) // indices[2]
+    Parameters
+    ----------
+    path : str
+        The TIFF filename.
+    index : dict, optional
+        A previously built index.
+
+    Returns
+    -------
+    index : dict
+        The file 'size' and 'mtime', the number of pages 'num_pages', and
+        the 'offsets' and 'byte_counts' of the strips of every page as
+        arrays of shape (num_pages, num_strips), together with the page
+        'shape', 'dtype', 'compression', 'predictor' and 'rows_per_strip'.
+        The 'offsets' are
+        None if the pages cannot be read directly, e.g. because they are
+        tiled or have differing formats.
+
+    Notes
+    -----
+    ImageJ stores stacks larger than 4 GB with a single IFD followed by the
+    contiguous data of all images.  For such files, the number of images is
+    taken from the ImageJ image description.
+    """
+    stat = os.stat(path)
+    if index is not None and index['size'] == stat.st_size and \
+            index['mtime'] == stat.st_mtime and 'rows_per_strip' in index:
+        return index
+    index = {'size': stat.st_size, 'mtime': stat.st_mtime, 'num_pages': 0,
+             'offsets': None, 'byte_counts': None, 'shape': None,
+             'dtype': None, 'compression': None, 'predictor': None,
+             'rows_per_strip': None}
+    with open(path, 'rb') as fh:
+        pages = list(_iter_tiff_ifds(fh))
+    index['num_pages'] = len(pages)
+    if not len(pages):
+        return index
+    page_format = pages[0][0]
+    if any(fmt != page_format for fmt, _, _, _ in pages):
+        return index
+    shape, dtype, compression, predictor, rows_per_strip, readable = \
+        page_format
+    if not readable:
+        return index
+    offsets = np.array([o for _, o, _, _ in pages], dtype='int64')
+    byte_counts = np.array([c for _, _, c, _ in pages], dtype='int64')
+    num_images = _imagej_num_images(pages[0][3])
+    page_nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    if len(pages) == 1 and num_images > 1 and compression is None and \
+            byte_counts.sum() == page_nbytes and np.all(
+                offsets[0, 1:] == offsets[0, :-1] + byte_counts[0, :-1]) and \
+            offsets[0, 0] + num_images * page_nbytes <= stat.st_size:
+        offsets = offsets + page_nbytes * np.arange(num_images)[:, None]
+        byte_counts = np.repeat(byte_counts, num_images, axis=0)
+        index['num_pages'] = num_images
+    index.update({
+        'offsets': offsets, 'byte_counts': byte_counts, 'shape': shape,
+        'dtype': dtype, 'compression': compression, 'predictor': predictor,
+        'rows_per_strip': rows_per_strip})
+    return index
+
+
+def _imagej_num_images(description):
+    """Return the number of images listed in an ImageJ description."""
+    if description is None or not description.startswith(b'ImageJ'):
+        return 0
+    try:
+        return int(imagej_description(description).get('images', 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _iter_tiff_ifds(fh):
+    """Iterate over the image file directories (IFDs) of a TIFF file.
+
+    Yields
+    ------
+    page_format : tuple
+        (shape, dtype, compression, predictor, rows_per_strip, readable),
+        where readable indicates whether the page can be read directly from its strips.
+    offsets : tuple of int
+        The strip offsets of the page.
+    byte_counts : tuple of int
+        The strip byte counts of the page.
+    description : bytes
+        The image description of the first page, None for the others.
+    """
+    fh.seek(0)
+    try:
+        byteorder = {b'II': '<', b'MM': '>'}[fh.read(2)]
+    except KeyError:
+        raise ValueError('Not a valid TIFF file')
+    version = struct.unpack(byteorder + 'H', fh.read(2))[0]
+    if version == 43:  # BigTIFF
+        fh.read(4)
+        offset_fmt, count_fmt, entry_size = 'Q', 'Q', 20
+    elif version == 42:
+        offset_fmt, count_fmt, entry_size = 'I', 'H', 12
+    else:
+        raise ValueError('Not a valid TIFF file')
+    offset_size = struct.calcsize(offset_fmt)
+    entry_dtype = np.dtype([
+        ('code', byteorder + 'u2'), ('type', byteorder + 'u2'),
+        ('count', byteorder + offset_fmt), ('value', 'V%d' % offset_size)])
+    ifd_offset = struct.unpack(byteorder + offset_fmt,
+                               fh.read(offset_size))[0]
+    visited = set()
+    codes = _TIFF_INDEX_TAGS + (270,)  # image_description of first page
+    while ifd_offset and ifd_offset not in visited:
+        visited.add(ifd_offset)
+        fh.seek(ifd_offset)
+        try:
+            num_tags = struct.unpack(
+                byteorder + count_fmt,
+                fh.read(struct.calcsize(count_fmt)))[0]
+            entries = np.frombuffer(fh.read(num_tags * entry_size),
+                                    entry_dtype, num_tags)
+            ifd_offset = struct.unpack(byteorder + offset_fmt,
+                                       fh.read(offset_size))[0]
+        except (struct.error, ValueError):
+            warnings.warn('Corrupted TIFF page list')
+            break
+        tags = {}
+        for entry in entries:
+            if int(entry['code']) not in codes:
+                continue
+            try:
+                dtype = np.dtype(byteorder + TIFF_DATA_TYPES[
+                    int(entry['type'])][-1].replace('s', 'B'))
+            except KeyError:
+                continue
+            count = int(entry['count'])
+            if count * dtype.itemsize <= offset_size:
+                raw = entry['value'].tobytes()[:count * dtype.itemsize]
+            else:
+                pos = fh.tell()
+                fh.seek(struct.unpack(byteorder + offset_fmt,
+                                      entry['value'].tobytes())[0])
+                raw = fh.read(count * dtype.itemsize)
+                fh.seek(pos)
+            tags[int(entry['code'])] = np.frombuffer(raw, dtype, count)
+        description = tags.pop(270, None)
+        if description is not None:
+            description = description.tobytes().rstrip(b'\0')
+        codes = _TIFF_INDEX_TAGS
+        yield _tiff_page_format(tags, byteorder) + (description,)
+
+
+# Tags read when indexing TIFF pages: image_width, image_length,
+# bits_per_sample, compression, photometric, strip_offsets,
+# samples_per_pixel, rows_per_strip, strip_byte_counts, predictor,
+# tile_width, extra_samples, sample_format
+_TIFF_INDEX_TAGS = (256, 257, 258, 259, 262, 273, 277, 278, 279, 317, 322,
+                    338, 339)
+
+
+def _tiff_page_format(tags, byteorder):
+    """Summarize the tags of a TIFF IFD for _iter_tiff_ifds."""
+    def tag(code, default=None):
+        try:
+            return int(tags[code][0])
+        except (KeyError, IndexError):
+            return default
+    shape = (tag(257, 0), tag(256, 0))
+    bits = tag(258, 1)
+    compression = TIFF_COMPESSIONS.get(tag(259, 1), 'unknown')
+    predictor = {1: None, 2: 'horizontal'}.get(tag(317, 1), 'unknown')
+    kind = {1: 'u', 2: 'i', 3: 'f'}.get(tag(339, 1))
+    offsets = tuple(int(o) for o in tags.get(273, ()))
+    byte_counts = tuple(int(c) for c in tags.get(279, ()))
+    # a single strip by default, and never more rows than the image
+    rows_per_strip = max(1, min(tag(278, shape[0]), shape[0]))
+    dtype = None
+    if kind is not None and bits in (8, 16, 32, 64) and \
+            not (kind == 'f' and bits == 8):
+        dtype = np.dtype(byteorder + kind + str(bits // 8)).str
+    readable = (
+        dtype is not None and compression in TIFF_DECOMPESSORS and
+        predictor != 'unknown' and tag(277, 1) == 1 and 322 not in tags and
+        338 not in tags and tag(262) != 3 and len(offsets) > 0 and
+        len(offsets) == len(byte_counts) and min(offsets) > 0 and
+        len(offsets) == -(-shape[0] // rows_per_strip))
+    return (shape, dtype, compression, predictor, rows_per_strip,
+            readable), offsets, byte_counts
+
+
+def _read_tiff_page(fh, index, page, rows=None):
+    """Read the image data of a TIFF page located with _tiff_page_index.
+
+    If rows (a range) is given, only the strips containing those rows are
+    read, and only those rows are returned.
+    """
+    dtype = np.dtype(index['dtype'])
+    offsets = index['offsets'][page]
+    byte_counts = index['byte_counts'][page]
+    num_rows, num_columns = index['shape']
+    if rows is None:
+        rows = range(num_rows)
+    if not len(rows):
+        return np.empty((0, num_columns), dtype=dtype)
+    first_row, stop_row = min(rows), max(rows) + 1
+    row_nbytes = num_columns * dtype.itemsize
+    if index['compression'] is None and np.all(
+            offsets[1:] == offsets[:-1] + byte_counts[:-1]):
+        fh.seek(offsets[0] + first_row * row_nbytes)
+        data = fh.read((stop_row - first_row) * row_nbytes)
+    else:
+        # all strips but the last contain the same number of rows
+        rows_per_strip = index['rows_per_strip']
+        first_strip = first_row // rows_per_strip
+        stop_strip = -(-stop_row // rows_per_strip)
+        decompress = TIFF_DECOMPESSORS[index['compression']]
+        strips = []
+        for offset, byte_count in zip(offsets[first_strip:stop_strip],
+                                      byte_counts[first_strip:stop_strip]):
+            fh.seek(offset)
+            strips.append(decompress(fh.read(byte_count)))
+        skip = (first_row - first_strip * rows_per_strip) * row_nbytes
+        data = b''.join(strips)[
+            skip:skip + (stop_row - first_row) * row_nbytes]
+    image = np.frombuffer(
+        data, dtype, (stop_row - first_row) * num_columns).reshape(
+            stop_row - first_row, num_columns)
+    if index['predictor'] == 'horizontal':
+        image = np.cumsum(image, axis=1, dtype=dtype)
+    if len(rows) != stop_row - first_row or rows[0] != first_row:
+        image = image[np.asarray(rows) - first_row]
+    return image
+
+
+def _read_tiff_pages(fh, index, start, stop):
+    """Read a run of TIFF pages located with _tiff_page_index.
+
+    Pages whose uncompressed image data are adjacent in the file are read
+    together with a single read.
+
+    Returns
+    -------
+    pages : np.ndarray
+        The image data, with shape (stop - start, num_rows, num_columns).
+    """
+    dtype = np.dtype(index['dtype'])
+    pages = np.empty((stop - start,) + index['shape'], dtype=dtype)
+    if index['compression'] is not None or index['predictor'] is not None:
+        for i, page in enumerate(range(start, stop)):
+            pages[i] = _read_tiff_page(fh, index, page)
+        return pages
+    offsets = index['offsets'][start:stop]
+    byte_counts = index['byte_counts'][start:stop]
+    page_nbytes = pages[0].nbytes if len(pages) else 0
+    # a run continues while each page is contiguous and directly follows
+    # the previous one
+    contiguous = np.all(offsets[:, 1:] == offsets[:, :-1] +
+                        byte_counts[:, :-1], axis=1) & \
+        (byte_counts.sum(axis=1) == page_nbytes)
+    adjacent = offsets[1:, 0] == offsets[:-1, 0] + page_nbytes
+    i = 0
+    while i < len(pages):
+        if not contiguous[i]:
+            pages[i] = _read_tiff_page(fh, index, start + i)
+            i += 1
+            continue
+        j = i + 1
+        while j < len(pages) and contiguous[j] and adjacent[j - 1]:
+            j += 1
+        fh.seek(offsets[i, 0])
+        pages[i:j] = np.frombuffer(
+            fh.read((j - i) * page_nbytes), dtype).reshape(pages[i:j].shape)
+        i = j
+    return pages
+
+
+def _memmap_tiff(path, index, num_planes=1, num_channels=1):
+    """Memory-map the pages of a TIFF file as a (t, z, y, x, c) array.
+
+    The image data of each page must be uncompressed and stored
+    contiguously, and the pages must be evenly spaced in the file.
+    Incomplete trailing frames are ignored.
+
+    Parameters
+    ----------
+    path : str
+        The TIFF filename.
+    index : dict
+        The page index of the file, see _tiff_page_index.
+
+    Raises
+    ------
+    ValueError
+        If the TIFF file cannot be memory-mapped.
+    """
+    if index['offsets'] is None or index['compression'] is not None or \
+            index['predictor'] is not None:
+        raise ValueError('TIFF pages cannot be memory-mapped')
+    dtype = np.dtype(index['dtype'])
+    num_rows, num_columns = index['shape']
+    page_nbytes = num_rows * num_columns * dtype.itemsize
+    pages_per_frame = num_planes * num_channels
+    num_frames = len(index['offsets']) // pages_per_frame
+    if num_frames == 0:
+        raise ValueError('TIFF file contains no complete frames')
+    strip_offsets = index['offsets'][:num_frames * pages_per_frame]
+    byte_counts = index['byte_counts'][:num_frames * pages_per_frame]
+    if np.any(byte_counts.sum(axis=1) != page_nbytes) or np.any(
+            strip_offsets[:, 1:] != strip_offsets[:, :-1] +
+            byte_counts[:, :-1]):
+        raise ValueError('TIFF page data is not contiguous')
+    offsets = strip_offsets[:, 0]
+    steps = np.diff(offsets)
+    stride = int(steps[0]) if len(steps) else page_nbytes
+    if np.any(steps != stride) or stride < page_nbytes or \
+            stride % dtype.itemsize:
+        raise ValueError('TIFF pages are not evenly spaced')
+    span = stride * (len(offsets) - 1) + page_nbytes
+    mapped = np.memmap(path, dtype=dtype, mode='r', offset=int(offsets[0]),
+                       shape=(span // dtype.itemsize,))
+    return np.lib.stride_tricks.as_strided(
+        mapped,
+        shape=(num_frames, num_planes, num_channels, num_rows, num_columns),
+        strides=(stride * pages_per_frame, stride * num_channels, stride,
+                 num_columns * dtype.itemsize, dtype.itemsize),
+        subok=True, writeable=False).transpose(0, 1, 3, 4, 2)
+
+
+class _Sequence_TIFFs(Sequence):
+
+    """
+
+    Parameters
+    ----------
+    paths : list of list of str
+        The string paths[i][j] is a unix style expression for the the
+        filenames for plane i and channel j. See glob for details.
+    dtype : data-type, optional
+        The data type of the frames. Default: float64.
+    workers : int, optional
+        The number of threads used to read the files of each frame or block
+        of frames. Defaults to the number of CPUs.
+
+    The files are globbed once, when the sequence is created, and the page
+    layout of each file is read once and cached, so that subsequent reads
+    of its image data require a single read per contiguous run of pages.
+    """
+
+    def __init__(self, paths, dtype=float, workers=None):
+        self._dtype = _as_dtype(dtype)
+        self._workers = workers
+        self._page_indices = {}
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        if isinstance(paths, np.ndarray):  # special case: loading saved data
+            assert paths.ndim == 3
+            self._paths = paths
+        else:
+            if not isinstance(paths, list):
+                raise ValueError('paths must be a list of list of str')
+            if not all(isinstance(p, list) for p in paths):
+                raise ValueError('paths must be a list of list of str')
+            # save paths as an array of shape (frames, planes, channels)
+            self._paths = np.array(
+                [[sorted(glob.glob(channel))
+                  if isinstance(channel, str) else channel
+                  for channel in plane] for plane in paths]
+            ).transpose(2, 0, 1)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __del__(self):
+        if self._pool is not None:
+            self._pool.terminate()
+
+    def _map(self, func, iterable):
+        """Map func over iterable in a pool of threads."""
+        with self._pool_lock:  # e.g. for reads from prefetching threads
+            if self._pool is None:
+                self._pool = ThreadPool(self._workers)
+        return self._pool.map(func, iterable)
+
+    def _read_file(self, path):
+        """Read the pages of a TIFF file into an array of shape (num_rows,
+        num_columns, num_pages)."""
+        try:
+            index = self._page_indices[path]
+        except KeyError:
+            index = self._page_indices[path] = _tiff_page_index(path)
+        if index['offsets'] is not None:
+            with open(path, 'rb') as fh:
+                pages = _read_tiff_pages(fh, index, 0, index['num_pages'])
+            return pages.transpose(1, 2, 0)
+
+        def unpack(p):
+            from PIL import Image
+            images = Image.open(p, 'r')
+            idx = 0
+            while True:
+                try:
+                    images.seek(idx)
+                except EOFError:
+                    break
+                else:
+                    idx += 1
+                    yield np.array(images)
+            images.close()
+
+        return np.concatenate(
+            [np.expand_dims(a, 2) for a in unpack(path)], axis=2)
+
+    def _arrange_frames(self, files, num_planes=None):
+        """Arrange the data of the files of consecutive frames into an array
+        of shape (num_frames, num_planes, num_rows, num_columns,
+        num_channels)."""
+        num_channels = self._paths.shape[2]
+        if num_planes is None:
+            num_planes = self._paths.shape[1]
+        files_per_frame = num_planes * num_channels
+        return _astype(np.array([
+            [np.concatenate(files[f:f + num_channels], axis=2)
+             for f in range(frame, frame + files_per_frame, num_channels)]
+            for frame in range(0, len(files), files_per_frame)]),
+            self._dtype)
+
+    def __iter__(self):
+        for frames in self.iter_blocks():
+            for frame in frames:
+                yield frame
+
+    def _get_frame(self, t):
+        return self._arrange_frames(
+            self._map(self._read_file, self._paths[t].ravel()))[0]
+
+    def get_frames(self, start, stop):
+        start, stop = _clip_block(start, stop, len(self))
+        if start == stop:
+            return np.empty((0,) + self.shape[1:])
+        return self._arrange_frames(
+            self._map(self._read_file, self._paths[start:stop].ravel()))
+
+    def _get_indexed_frames(self, start, stop, indices):
+        """Read only the files of the selected planes."""
+        planes, rows, columns, channels = _expand_indices(indices)
+        start, stop = _clip_block(start, stop, len(self))
+        paths = self._paths[start:stop, planes] \
+            if isinstance(planes, slice) else self._paths[:0]
+        if not paths.size:
+            return super(_Sequence_TIFFs, self)._get_indexed_frames(
+                start, stop, indices)
+        frames = self._arrange_frames(
+            self._map(self._read_file, paths.ravel()), paths.shape[1])
+        return np.copy(frames[:, :, rows, columns, channels])
+
+    def _todict(self, savedir=None):
+        return {'__class__': self.__class__, 'paths': self._paths,
+                'dtype': self._dtype, 'workers': self._workers}
+
+
+class _Sequence_ndarray(Sequence):
+
+    """
+    Sequence of frames held in a numpy array.
+
+    When saved with an ImagingDataset, the array is written to a sidecar .npy
+    file in the dataset directory, which is memory-mapped when the dataset
+    is loaded, rather than being pickled with the other sequence data.
+    """
+
+    def __init__(self, array, dtype=float):
+        self._array = array
+        self._dtype = _as_dtype(dtype)
+
+    def __len__(self):
+        return len(self._array)
+
+    def _get_frame(self, t):
+        return _astype(self._array[t], self._dtype)
+
+    def get_frames(self, start, stop):
+        start, stop = _clip_block(start, stop, len(self))
+        return _astype(self._array[start:stop], self._dtype)
+
+    def _get_indexed_frames(self, start, stop, indices):
+        start, stop = _clip_block(start, stop, len(self))
+        frames = self._array[(slice(start, stop),) + indices]
+        return np.copy(frames) if self._dtype is None else \
+            _astype(frames, self._dtype)
+
+    def _todict(self, savedir=None):
+        if savedir is None:
+            return {'__class__': self.__class__, 'array': self._array,
+                    'dtype': self._dtype}
+        path = _SidecarFiles.current(savedir).write(
+            'sequence', lambda p: np.save(p, np.asarray(self._array)),
+            self._mapped_file())
+        return {'__class__': _Sequence_Sidecar, 'dtype': self._dtype,
+                '_abspath': path, '_relpath': relpath(path, savedir)}
+
+    def _mapped_file(self):
+        """The (path, identity) of the file the array is memory-mapped
+        from, if it is a sidecar file."""
+        return None
+
+
+class _Sequence_NPY(_Sequence_ndarray):
+
+    """
+    Sequence memory-mapped from a .npy file.
+
+    See sima.Sequence.create() for details.
+    """
+
+    def __init__(self, path, dtype=None):
+        self._path = abspath(path)
+        self._identity = _file_identity(self._path)
+        array = np.load(self._path, mmap_mode='r')
+        if array.ndim != 5:
+            raise ValueError(
+                'The array must have 5 dimensions (t, z, y, x, c).')
+        super(_Sequence_NPY, self).__init__(array, dtype)
+
+    def _todict(self, savedir=None):
+        d = {'__class__': self.__class__, 'dtype': self._dtype}
+        if savedir is None:
+            d.update({'path': abspath(self._path)})
+        else:
+            _SidecarFiles.current(savedir).referenced.add(self._path)
+            d.update({'_abspath': abspath(self._path),
+                      '_relpath': relpath(self._path, savedir)})
+        return d
+
+
+class _Sequence_Sidecar(_Sequence_NPY):
+
+    """
+    Sequence of an ndarray saved with an ImagingDataset, memory-mapped from
+    its sidecar .npy file in the dataset directory.
+
+    The file belongs to the dataset: it is rewritten or removed when the
+    dataset is saved again, and copied when the dataset is saved to a new
+    directory.
+    """
+
+    def _todict(self, savedir=None):
+        if savedir is None:
+            return super(_Sequence_Sidecar, self)._todict()
+        return _Sequence_ndarray._todict(self, savedir)
+
+    def _mapped_file(self):
+        return (self._path, self._identity)
+
+
+class _Sequence_raw(_Sequence_ndarray):
+
+    """
+    Sequence memory-mapped from a file of raw binary data.
+
+    See sima.Sequence.create() for details.
+    """
+
+    def __init__(self, path, shape, file_dtype, offset=0, dtype=None):
+        self._path = abspath(path)
+        self._file_dtype = np.dtype(file_dtype)
+        self._offset = offset
+        shape = tuple(shape)
+        if len(shape) != 5:
+            raise ValueError('shape must have 5 entries (t, z, y, x, c).')
+        if shape[0] is None:
+            frame_bytes = int(np.prod(shape[1:])) * self._file_dtype.itemsize
+            shape = ((os.path.getsize(self._path) - offset) //
+                     frame_bytes,) + shape[1:]
+        self._raw_shape = shape
+        super(_Sequence_raw, self).__init__(
+            np.memmap(self._path, self._file_dtype, 'r', offset, shape),
+            dtype)
+
+    def _todict(self, savedir=None):
+        d = {'__class__': self.__class__, 'shape': self._raw_shape,
+             'file_dtype': self._file_dtype, 'offset': self._offset,
+             'dtype': self._dtype}
+        if savedir is None:
+            d.update({'path': abspath(self._path)})
+        else:
+            _SidecarFiles.current(savedir).referenced.add(self._path)
+            d.update({'_abspath': abspath(self._path),
+                      '_relpath': relpath(self._path, savedir)})
+        return d
+
+
+class _Sequence_HDF5(Sequence):
+
+    """
+    Iterable for an HDF5 file containing imaging data.
+
+    See sima.Sequence.create() for details.
+    """
+
+    def __init__(self, path, dim_order, group=None, key=None, dtype=float):
+        h5py = sima.misc.optional_import('h5py', '2.2.1')
+        if h5py is None:
+            raise ImportError('h5py >= 2.2.1 required')
+        self._path = abspath(path)
+        self._dtype = _as_dtype(dtype)
+        self._file = h5py.File(path, 'r')
+        if group is None:
+            group = '/'
+        self._group = self._file[group]
+        if key is None:
+            if len(list(self._group.keys())) != 1:
+                raise ValueError(
+                    'key must be provided to resolve ambiguity.')
+            key = list(self._group.keys())[0]
+        self._key = key
+        self._dataset = self._group[key]
+        if len(dim_order) != len(self._dataset.shape):
+            raise ValueError(
+                'dim_order must have same length as the number of ' +
+                'dimensions in the HDF5 dataset.')
+        self._T_DIM = dim_order.find('t')
+        self._Z_DIM = dim_order.find('z')
+        self._Y_DIM = dim_order.find('y')
+        self._X_DIM = dim_order.find('x')
+        self._C_DIM = dim_order.find('c')
+        self._dim_order = dim_order
+
+    def __del__(self):
+        self._file.close()
+
+    def __len__(self):
+        return self._dataset.shape[self._T_DIM]
+        # indices = self._time_slice.indices(self._dataset.shape[self._T_DIM])
+        # return (indices[1] - indices[0] + indices[2] - 1) // indices[2]
 
     def _get_frame(self, t):
         """Get the frame at time t, but not clipped"""
@@ -661,13 +1870,174 @@ class _Sequence_HDF5(Sequence):
                 frame = frame.swapaxes(i, idx)
         assert swapper == [0, 1, 2, 3]
         assert frame.ndim == 4
-        return frame.astype(float)
+        return _astype(frame, self._dtype)
+
+    def get_frames(self, start, stop):
+        """Get a block of frames with a single hyperslab read."""
+        return self._get_indexed_frames(start, stop, ())
+
+    def _get_indexed_frames(self, start, stop, indices):
+        """Read the selected data with a single hyperslab read."""
+        start, stop = _clip_block(start, stop, len(self))
+        indices = _expand_indices(indices)
+        slices = [slice(None)] * self._dataset.ndim
+        slices[self._T_DIM] = slice(start, stop)
+        remaining = [slice(None)] * 5  # indices to apply after reading
+        for k, (dim, idx) in enumerate(zip(
+                (self._Z_DIM, self._Y_DIM, self._X_DIM, self._C_DIM),
+                indices)):
+            if dim >= 0 and isinstance(idx, slice) and \
+                    idx.step in (None, 1) and \
+                    not (idx.start or 0) < 0 and not (idx.stop or 0) < 0:
+                slices[dim] = idx
+            else:
+                remaining[k + 1] = idx
+        frames = self._dataset[tuple(slices)]
+        axes = []
+        for dim in (self._T_DIM, self._Z_DIM, self._Y_DIM, self._X_DIM,
+                    self._C_DIM):
+            if dim < 0:
+                frames = np.expand_dims(frames, -1)
+                axes.append(frames.ndim - 1)
+            else:
+                axes.append(dim)
+        frames = frames.transpose(axes)
+        if any(idx != slice(None) for idx in remaining):
+            frames = np.copy(frames[tuple(remaining)])
+        return _astype(frames, self._dtype)
 
     def _todict(self, savedir=None):
         d = {'__class__': self.__class__,
              'dim_order': self._dim_order,
              'group': self._group.name,
-             'key': self._key}
+             'key': self._key,
+             'dtype': self._dtype}
+        if savedir is None:
+            d.update({'path': abspath(self._path)})
+        else:
+            d.update({'_abspath': abspath(self._path),
+                      '_relpath': relpath(self._path, savedir)})
+        return d
+
+
+class _Sequence_Chunked(Sequence):
+
+    """
+    Sequence stored in a directory of separately compressed chunks.
+
+    See sima.Sequence.create() for details.
+
+    Parameters
+    ----------
+    path : str
+        The directory of the store.
+    dtype : data-type, optional
+        The data type of the frames. Default: float64. If None, the stored
+        data type is used.
+    workers : int, optional
+        The number of threads used to decompress the chunks of each block of
+        frames. Defaults to the number of CPUs.
+    """
+
+    def __init__(self, path, dtype=float, workers=None):
+        self._path = abspath(path)
+        self._dtype = _as_dtype(dtype)
+        self._workers = workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        with open(join(self._path, _CHUNKED_HEADER)) as f:
+            header = json.load(f)
+        if header.get('format') != _CHUNKED_FORMAT:
+            raise ValueError('Not a chunked store: ' + path)
+        if header['version'] > _CHUNKED_VERSION:
+            raise ValueError('Unsupported chunked store version: %d' %
+                             header['version'])
+        self._shape = tuple(header['shape'])
+        self._chunks = tuple(header['chunks'])
+        self._stored_dtype = np.dtype(header['dtype'])
+        self._compression = header['compression']
+        self._shuffle = header['shuffle']
+
+    def __len__(self):
+        return self._shape[0]
+
+    def __del__(self):
+        if self._pool is not None:
+            self._pool.terminate()
+
+    @property
+    def shape(self):
+        return self._shape
+
+    def _map(self, func, iterable):
+        """Map func over iterable in a pool of threads."""
+        with self._pool_lock:  # e.g. for reads from prefetching threads
+            if self._pool is None:
+                self._pool = ThreadPool(self._workers)
+        return self._pool.map(func, iterable)
+
+    def _read_chunk(self, key):
+        """Read and decompress the chunk with grid position key."""
+        with open(join(self._path, _chunk_name(key)), 'rb') as f:
+            data = _CHUNK_CODECS[self._compression][1](f.read())
+        shape = [min(c, dim - k * c)
+                 for k, c, dim in zip(key, self._chunks, self._shape)]
+        if self._shuffle:
+            data = _unshuffle_bytes(data, self._stored_dtype.itemsize)
+        return np.frombuffer(data, self._stored_dtype).reshape(shape)
+
+    def __iter__(self):
+        for frames in self.iter_blocks():
+            for frame in frames:
+                yield frame
+
+    def iter_blocks(self, block_size=None):
+        if block_size is None:
+            # whole chunks, so that each chunk is decompressed once
+            block_size = self._chunks[0] * max(
+                1, _default_block_size(self.shape) // self._chunks[0])
+        return super(_Sequence_Chunked, self).iter_blocks(block_size)
+
+    def _get_frame(self, t):
+        if not 0 <= t < len(self):
+            raise IndexError('Frame index out of range')
+        return self.get_frames(t, t + 1)[0]
+
+    def get_frames(self, start, stop):
+        return self._get_indexed_frames(start, stop, ())
+
+    def _get_indexed_frames(self, start, stop, indices):
+        """Read and decompress only the chunks containing selected data."""
+        start, stop = _clip_block(start, stop, len(self))
+        bounds = [(start, stop)]
+        remaining = [slice(None)]  # indices to apply after reading
+        for dim, idx in zip(self._shape[1:], _expand_indices(indices)):
+            if isinstance(idx, slice) and idx.step in (None, 1):
+                low, high = idx.indices(dim)[:2]
+                bounds.append((low, max(low, high)))
+                remaining.append(slice(None))
+            else:
+                bounds.append((0, dim))
+                remaining.append(idx)
+        out = np.empty([high - low for low, high in bounds],
+                       self._stored_dtype)
+        origin = [low for low, _ in bounds]
+
+        def read(key):
+            _paste(out, origin, self._read_chunk(key),
+                   [k * c for k, c in zip(key, self._chunks)])
+
+        if out.size:
+            self._map(read, list(it.product(*[
+                range(low // c, (high - 1) // c + 1)
+                for (low, high), c in zip(bounds, self._chunks)])))
+        if any(idx != slice(None) for idx in remaining):
+            out = out[tuple(remaining)]
+        return _astype(out, self._dtype)
+
+    def _todict(self, savedir=None):
+        d = {'__class__': self.__class__, 'dtype': self._dtype,
+             'workers': self._workers}
         if savedir is None:
             d.update({'path': abspath(self._path)})
         else:
@@ -676,6 +2046,143 @@ class _Sequence_HDF5(Sequence):
         return d
 
 
+class _ChunkedWriter(object):
+
+    """Write consecutive blocks of frames to a chunked store.
+
+    The header is written when the writer is closed, so that an incomplete
+    store cannot be read.
+
+    Parameters
+    ----------
+    path : str
+        The directory of the store. Existing chunks in it are removed.
+    frame_shape : tuple of int
+        The shape (num_planes, num_rows, num_columns, num_channels) of the
+        frames.
+    dtype : data-type
+        The data type in which the frames are stored.
+    chunks : tuple of int, optional
+        The chunk shape over (time, plane, row, column, channel). Defaults to
+        whole frames, with as many frames as fit in about 1 MB.
+    compression : {None, 'zlib', 'bz2', 'lzma'}, optional
+        The compression of the chunks. Compressed chunks are byte-shuffled,
+        which groups bytes of equal significance together.
+    channel_names : list of str, optional
+        Labels of the channels, which are stored in the header.
+    workers : int, optional
+        The number of threads used to compress the chunks.
+    """
+
+    def __init__(self, path, frame_shape, dtype, chunks=None,
+                 compression=None, channel_names=None, workers=None):
+        if compression not in _CHUNK_CODECS:
+            raise ValueError('Unsupported compression: ' + str(compression))
+        self._path = path
+        self._frame_shape = tuple(frame_shape)
+        self._dtype = np.dtype(dtype)
+        if chunks is None:
+            frame_bytes = int(np.prod(frame_shape)) * self._dtype.itemsize
+            chunks = (max(1, 2 ** 20 // frame_bytes),) + self._frame_shape
+        if len(chunks) != 5 or any(c < 1 for c in chunks):
+            raise ValueError('chunks must be five positive integers')
+        self._chunks = tuple(int(c) for c in chunks)
+        self._compression = compression
+        self._channel_names = channel_names
+        self._num_frames = 0
+        self._pending = []  # frames not yet written, fewer than a chunk
+        self._pool = ThreadPool(workers)
+        sima.misc.mkdir_p(path)
+        for name in os.listdir(path):
+            if name == _CHUNKED_HEADER or _is_chunk_name(name):
+                os.remove(join(path, name))
+
+    def write(self, frames):
+        """Append a block of frames with shape (num_frames,) + frame_shape.
+        """
+        self._pending.extend(frames)
+        num_whole = len(self._pending) // self._chunks[0] * self._chunks[0]
+        if num_whole:
+            self._write_frames(np.array(self._pending[:num_whole]))
+            self._pending = self._pending[num_whole:]
+
+    def _write_frames(self, frames):
+        """Write frames starting at the boundary of a chunk."""
+        t0 = self._num_frames // self._chunks[0]
+        shape = (len(frames),) + self._frame_shape
+        keys = it.product(*[range(-(-dim // c))
+                            for dim, c in zip(shape, self._chunks)])
+
+        def write(key):
+            chunk = frames[tuple(slice(k * c, (k + 1) * c)
+                                 for k, c in zip(key, self._chunks))]
+            data = np.ascontiguousarray(chunk, self._dtype).tobytes()
+            if self._compression is not None:
+                data = _CHUNK_CODECS[self._compression][0](
+                    _shuffle_bytes(data, self._dtype.itemsize))
+            with open(join(self._path, _chunk_name(
+                    (t0 + key[0],) + key[1:])), 'wb') as f:
+                f.write(data)
+
+        self._pool.map(write, list(keys))
+        self._num_frames += len(frames)
+
+    def close(self):
+        """Write the remaining frames and the header."""
+        if len(self._pending):
+            self._write_frames(np.array(self._pending))
+            self._pending = []
+        self._pool.close()
+        header = {
+            'format': _CHUNKED_FORMAT,
+            'version': _CHUNKED_VERSION,
+            'shape': (self._num_frames,) + self._frame_shape,
+            'chunks': self._chunks,
+            'dtype': self._dtype.str,
+            'compression': self._compression,
+            'shuffle': self._compression is not None,
+            'channel_names': None if self._channel_names is None
+            else [str(name) for name in self._channel_names],
+        }
+        with open(join(self._path, _CHUNKED_HEADER), 'w') as f:
+            json.dump(header, f, indent=2)
+
+
+_CHUNKED_FORMAT = 'sima-chunked'
+_CHUNKED_VERSION = 1
+_CHUNKED_HEADER = 'header.json'
+# (compress, decompress) functions of the chunk compression filters
+_CHUNK_CODECS = {None: (lambda data: data, lambda data: data),
+                 'zlib': (zlib.compress, zlib.decompress),
+                 'bz2': (bz2.compress, bz2.decompress)}
+if lzma is not None:
+    _CHUNK_CODECS['lzma'] = (lzma.compress, lzma.decompress)
+
+
+def _chunk_name(key):
+    """The file name of the chunk at position key of the chunk grid."""
+    return '.'.join(str(k) for k in key)
+
+
+def _is_chunk_name(name):
+    parts = name.split('.')
+    return len(parts) == 5 and all(p.isdigit() for p in parts)
+
+
+def _shuffle_bytes(data, itemsize):
+    """Group the bytes of equal significance of the items together."""
+    if itemsize == 1:
+        return data
+    return np.frombuffer(data, np.uint8).reshape(-1, itemsize).T.tobytes()
+
+
+def _unshuffle_bytes(data, itemsize):
+    """Invert _shuffle_bytes."""
+    if itemsize == 1:
+        return data
+    return np.frombuffer(data, np.uint8).reshape(itemsize, -1).T.tobytes()
+
+
 class _Joined_Sequence(Sequence):
 
     def __init__(self, sequences):
@@ -707,6 +2214,34 @@ class _Joined_Sequence(Sequence):
         return np.concatenate([seq._get_frame(t) for seq in self._sequences],
                               axis=3)
 
+    def get_frames(self, start, stop):
+        return np.concatenate(
+            [seq.get_frames(start, stop) for seq in self._sequences], axis=4)
+
+    def _get_indexed_frames(self, start, stop, indices):
+        """Read only the sequences containing the selected channels."""
+        indices = _expand_indices(indices)
+        channels = indices[3]
+        if not isinstance(channels, slice) or channels.step not in (None, 1):
+            return super(_Joined_Sequence, self)._get_indexed_frames(
+                start, stop, indices)
+        channels = range(self.shape[4])[channels]
+        frames = []
+        first_channel = 0
+        for seq in self._sequences:
+            num_channels = seq.shape[4]
+            selected = [c - first_channel for c in channels
+                        if first_channel <= c < first_channel + num_channels]
+            if len(selected):
+                frames.append(seq._get_indexed_frames(
+                    start, stop,
+                    indices[:3] + (slice(selected[0], selected[-1] + 1),)))
+            first_channel += num_channels
+        if not len(frames):
+            return super(_Joined_Sequence, self)._get_indexed_frames(
+                start, stop, indices)
+        return np.concatenate(frames, axis=4)
+
     def _todict(self, savedir=None):
         return {
             '__class__': self.__class__,
@@ -764,21 +2299,34 @@ class _MotionCorrectedSequence(_WrapperSequence):
         The _D displacement of each row in the image cycle.
         Shape: (num_frames, num_planes, num_rows, 2).
 
-    This object has the same attributes and methods as the class it wraps."""
+    This object has the same attributes and methods as the class it wraps.
+
+    When saved with an ImagingDataset, the displacements are written to a
+    separate file, from which they are read only when frames are accessed.
+    """
 
     def __init__(self, base, displacements, extent=None):
         super(_MotionCorrectedSequence, self).__init__(base)
-        if np.min(displacements) < 0:
-            raise ValueError("All displacements must be non-negative")
-        self.displacements = displacements.astype('int')
+        if isinstance(displacements, _RunLengthDisplacements):
+            self._displacements = displacements  # decoded when needed
+        else:
+            if np.min(displacements) < 0:
+                raise ValueError("All displacements must be non-negative")
+            self._displacements = displacements.astype('int')
         if extent is None:
             max_disp = np.nanmax([np.nanmax(d.reshape(-1, d.shape[-1]), 0)
-                                  for d in displacements], 0)
+                                  for d in self.displacements], 0)
             extent = np.array(base._sequences[0].shape)[1:-1]
             extent[1:3] += max_disp
         assert len(extent) == 3
         self._frame_shape_zyx = tuple(extent)   # (planes, rows, columns)
 
+    @property
+    def displacements(self):
+        if isinstance(self._displacements, _RunLengthDisplacements):
+            self._displacements = np.asarray(self._displacements)
+        return self._displacements
+
     @ property
     def _frame_shape(self):
         return self._frame_shape_zyx + (self._base.shape[4],)
@@ -786,27 +2334,74 @@ class _MotionCorrectedSequence(_WrapperSequence):
     def __len__(self):
         return len(self._base)  # Faster to calculate len without aligning
 
-    def _align(self, frame, displacement):
+    def _align(self, frame, displacement, out=None, origin=(0, 0, 0)):
+        """Align a frame.
+
+        Parameters
+        ----------
+        frame : array
+            The uncorrected frame.
+        displacement : array
+            The displacements of the frame.
+        out : array, optional
+            The array into which the aligned frame is written, initialized
+            with NaN, representing the part of the corrected frame starting
+            at the (plane, row, column) origin. By default, a new array
+            covering the whole corrected frame is returned.
+        """
         if displacement.ndim == 3:
-            return _align_frame(frame.astype(float), displacement.astype(int),
-                                self._frame_shape)
-        elif displacement.ndim == 2:  # plane-wise displacement
-            out = np.nan * np.ones(self._frame_shape)
-            s = frame.shape
+            return self._align_block(
+                frame[np.newaxis], displacement[np.newaxis],
+                None if out is None else out[np.newaxis], origin)[0]
+        if out is None:
+            # floating point frames keep their precision, e.g. float32
+            out = np.full(
+                self._frame_shape_zyx + frame.shape[-1:], np.nan,
+                dtype=frame.dtype if frame.dtype.kind == 'f' else float)
+        if displacement.ndim == 2:  # plane-wise displacement
             for p, (plane, disp) in enumerate(zip(frame, displacement)):
                 if len(disp) == 2:
                     disp = [0] + list(disp)
-                out[p + disp[0],
-                    disp[1]:(disp[1] + s[1]),
-                    disp[2]:(disp[2] + s[2])] = plane
-            return out
+                if origin[0] <= p + disp[0] < origin[0] + out.shape[0]:
+                    _paste(out[p + disp[0] - origin[0]], origin[1:], plane,
+                           disp[1:])
         elif displacement.ndim == 1:  # frame-wise displacement
-            out = np.nan * np.ones(self._frame_shape)
-            s = frame.shape
-            out[displacement[0]:(displacement[0] + s[0]),
-                displacement[1]:(displacement[1] + s[1]),
-                displacement[2]:(displacement[2] + s[2])] = frame
-            return out
+            _paste(out, origin, frame, displacement)
+        return out
+
+    def _align_block(self, frames, displacements, out=None,
+                     origin=(0, 0, 0)):
+        """Align a block of frames.
+
+        Parameters
+        ----------
+        frames : array
+            The uncorrected frames.
+        displacements : array
+            The displacements of each of the frames.
+        out : array, optional
+            The float32 or float64 array into which the aligned frames are
+            written, representing the part of the corrected frames starting
+            at the (plane, row, column) origin. By default, a new array
+            covering the whole corrected frames is returned.
+
+        Returns
+        -------
+        out : array
+        """
+        if out is None:
+            out = np.empty(
+                (len(frames),) + self._frame_shape_zyx + frames.shape[4:],
+                dtype=frames.dtype if frames.dtype.kind == 'f' else float)
+        if displacements.ndim == 4:  # row-wise displacement
+            _align_frames(frames.astype(out.dtype, copy=False),
+                          displacements.astype(int, copy=False), out, origin)
+        else:
+            out.fill(np.nan)
+            for frame, displacement, frame_out in zip(
+                    frames, displacements, out):
+                self._align(frame, displacement, frame_out, origin)
+        return out
 
     @property
     def shape(self):
@@ -818,7 +2413,33 @@ class _MotionCorrectedSequence(_WrapperSequence):
             yield self._align(frame, displacement)
 
     def _get_frame(self, t):
-        return self._align(self._base._get_frame(t), self.displacements[t])
+        return self._align(self._base._get_frame(t), self._displacements[t])
+
+    def get_frames(self, start, stop):
+        return self._get_indexed_frames(start, stop, ())
+
+    def _get_indexed_frames(self, start, stop, indices):
+        """Align frames directly into an output trimmed to the indices.
+
+        Channel indices are passed on to the base sequence, and the block
+        of frames is aligned in one pass into the selected part of the
+        corrected frames, without creating the whole corrected frames.
+        """
+        trim = _expand_indices(indices)[:3]
+        channels = _expand_indices(indices)[3]
+        if not all(isinstance(idx, slice) and idx.step in (None, 1)
+                   for idx in trim):
+            return super(_MotionCorrectedSequence, self)._get_indexed_frames(
+                start, stop, indices)
+        start, stop = _clip_block(start, stop, len(self))
+        window = [range(n)[idx] for n, idx in zip(self._frame_shape_zyx, trim)]
+        frames = self._base._get_indexed_frames(
+            start, stop, (slice(None),) * 3 + (channels,))
+        out = np.empty(
+            (len(frames),) + tuple(len(w) for w in window) + frames.shape[4:],
+            dtype=frames.dtype if frames.dtype.kind == 'f' else float)
+        return self._align_block(frames, self._displacements[start:stop],
+                                 out, tuple(w.start for w in window))
 
     def __getitem__(self, indices):
         if len(indices) > 5:
@@ -843,13 +2464,117 @@ class _MotionCorrectedSequence(_WrapperSequence):
         return _IndexedSequence(self, indices)
 
     def _todict(self, savedir=None):
+        displacements = self._displacements
+        if savedir is not None:
+            mapped_file = None
+            if isinstance(displacements, _RunLengthDisplacements):
+                mapped_file = (displacements.path, displacements.identity)
+            path = _SidecarFiles.current(savedir).write(
+                'displacements',
+                lambda p: _RunLengthDisplacements.save(p, displacements),
+                mapped_file)
+            displacements = {'shape': displacements.shape, '_abspath': path,
+                             '_relpath': relpath(path, savedir)}
+        elif not isinstance(displacements, _RunLengthDisplacements):
+            displacements = displacements.astype('int16')
         return {
             '__class__': self.__class__,
             'base': self._base._todict(savedir),
-            'displacements': self.displacements.astype('int16'),
+            'displacements': displacements,
             'extent': self._frame_shape[:3],
         }
 
+    @classmethod
+    def _from_dict(cls, d, savedir=None):
+        if isinstance(d['displacements'], dict):  # saved in a separate file
+            displacements = dict(d['displacements'])
+            if savedir is not None:
+                _resolve_paths(displacements, savedir)
+            d['displacements'] = _RunLengthDisplacements(**displacements)
+        return super(_MotionCorrectedSequence, cls)._from_dict(d, savedir)
+
+
+class _RunLengthDisplacements(object):
+
+    """Displacements stored in a .npy file as runs of equal displacements.
+
+    The displacements of consecutive rows, planes or frames are usually
+    equal, e.g. for frame-wise motion correction, so each run of equal
+    displacements is stored once, as its first index into the flattened
+    displacements and the int16 displacement. The file is memory-mapped,
+    so that the displacements of a block of frames are decoded without
+    reading the others.
+
+    Parameters
+    ----------
+    path : str
+        The .npy file of the runs.
+    shape : tuple of int
+        The shape of the displacements, (num_frames, ..., num_dimensions).
+    """
+
+    def __init__(self, path, shape):
+        self.path = abspath(path)
+        self.shape = tuple(shape)
+        # mapped now, so that the runs stay readable if the file is replaced
+        self.identity = _file_identity(self.path)
+        self._runs = np.load(self.path, mmap_mode='r')
+
+    @classmethod
+    def save(cls, path, displacements):
+        """Encode and save displacements, returning the stored object."""
+        displacements = np.asarray(displacements)
+        if len(displacements) and (np.min(displacements) < 0 or
+                                   np.max(displacements) > 2 ** 15 - 1):
+            raise ValueError('Displacements must be in the int16 range')
+        flat = displacements.reshape(-1, displacements.shape[-1])
+        changes = np.ones(len(flat), dtype=bool)
+        changes[1:] = np.any(flat[1:] != flat[:-1], axis=1)
+        starts = np.flatnonzero(changes)
+        runs = np.empty(len(starts), dtype=[
+            ('start', '<i8'), ('displacement', '<i2', (flat.shape[1],))])
+        runs['start'] = starts
+        runs['displacement'] = flat[starts]
+        np.save(path, runs)
+        return cls(path, displacements.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __getitem__(self, times):
+        if isinstance(times, (int, np.integer)):
+            if not -len(self) <= times < len(self):
+                raise IndexError('Frame index out of range')
+            times %= len(self)
+            return self._decode(times, times + 1)[0]
+        if isinstance(times, slice) and times.step in (None, 1):
+            start, stop = times.indices(len(self))[:2]
+            return self._decode(start, max(start, stop))
+        return np.asarray(self)[times]
+
+    def __array__(self, dtype=None):
+        displacements = self._decode(0, len(self))
+        return displacements if dtype is None else \
+            displacements.astype(dtype)
+
+    def _decode(self, start, stop):
+        """Decode the displacements of frames start to stop."""
+        frame_size = int(np.prod(self.shape[1:-1]))
+        low, high = start * frame_size, stop * frame_size
+        flat = np.empty((high - low, self.shape[-1]), dtype=int)
+        if high > low:
+            starts = self._runs['start']
+            first = np.searchsorted(starts, low, 'right') - 1
+            last = np.searchsorted(starts, high, 'left')
+            runs = self._runs[first:last]
+            bounds = np.append(np.maximum(runs['start'], low), high)
+            flat[:] = np.repeat(runs['displacement'], np.diff(bounds), axis=0)
+        return flat.reshape((stop - start,) + self.shape[1:])
+
 
 class _MaskedSequence(_WrapperSequence):
 
@@ -889,6 +2614,10 @@ class _MaskedSequence(_WrapperSequence):
             masks = masks + self._mask_dict[t]
         except KeyError:
             pass
+        if len(masks) and not (frame.dtype.kind == 'f' and
+                               frame.flags.writeable):
+            # e.g. read-only integer views into memory-mapped files
+            frame = frame.astype(float)
         for i in masks:
             outer = self._outers[i][1:]
             if len(outer) == 2:  # (zyx, channels)
@@ -935,16 +2664,25 @@ class _MaskedSequence(_WrapperSequence):
                             frame[p, mask, c] = np.nan
             else:
                 raise Exception
+        return frame
 
     def _get_frame(self, t):
-        frame = self._base._get_frame(t)
-        self._apply_masks(frame, t)
-        return frame
+        return self._apply_masks(self._base._get_frame(t), t)
+
+    def get_frames(self, start, stop):
+        frames = self._base.get_frames(start, stop)
+        if not (frames.dtype.kind == 'f' and frames.flags.writeable) and (
+                len(self._static_masks) or any(
+                    t in self._mask_dict
+                    for t in range(start, start + len(frames)))):
+            frames = frames.astype(float)
+        for t, frame in enumerate(frames, start):
+            self._apply_masks(frame, t)
+        return frames
 
     def __iter__(self):
         for t, frame in enumerate(self._base):
-            self._apply_masks(frame, t)
-            yield frame
+            yield self._apply_masks(frame, t)
 
     @property
     def shape(self):
@@ -978,16 +2716,16 @@ class _IndexedSequence(_WrapperSequence):
             else:
                 new_indices.append(slice(i, i + 1))
         self._indices = tuple(new_indices)
-        self._times = list(range(self._base_len))[self._indices[0]]
-        # TODO: switch to generator/iterator if possible?
+        self._frame_indices = _frame_indices(self._indices[1:])
+        self._times = range(self._base_len)[self._indices[0]]
 
     def __iter__(self):
         try:
             for t in self._times:
-                # Note the np.copy is necessary to prevent the whole array
-                # into which the view is being made from being stored in
-                # memory.
-                yield np.copy(self._base._get_frame(t)[self._indices[1:]])
+                # The base reads only the selected data, without keeping the
+                # whole frame in memory.
+                yield self._base._get_indexed_frames(
+                    t, t + 1, self._frame_indices)[0]
         except NotImplementedError:
             if self._indices[0].step < 0:
                 raise NotImplementedError(
@@ -1006,10 +2744,38 @@ class _IndexedSequence(_WrapperSequence):
                     idx += 1
 
     def _get_frame(self, t):
-        return self._base._get_frame(self._times[t])[self._indices[1:]]
+        t = self._times[t]
+        return self._base._get_indexed_frames(
+            t, t + 1, self._frame_indices)[0]
+
+    def get_frames(self, start, stop):
+        times = self._times[start:stop]
+        if len(times) > 1 and times[1] - times[0] == 1:
+            return self._base._get_indexed_frames(
+                times[0], times[-1] + 1, self._frame_indices)
+        elif len(times):
+            return np.concatenate([self._base._get_indexed_frames(
+                t, t + 1, self._frame_indices) for t in times])
+        else:
+            return np.empty((0,) + self.shape[1:])
+
+    def _get_indexed_frames(self, start, stop, indices):
+        if any(idx != slice(None) for idx in self._frame_indices):
+            return super(_IndexedSequence, self)._get_indexed_frames(
+                start, stop, indices)
+        # indexing in time only, so the frame indices can be passed on
+        times = self._times[start:stop]
+        if len(times) > 1 and times[1] - times[0] == 1:
+            return self._base._get_indexed_frames(
+                times[0], times[-1] + 1, indices)
+        elif len(times):
+            return np.concatenate([self._base._get_indexed_frames(
+                t, t + 1, indices) for t in times])
+        return super(_IndexedSequence, self)._get_indexed_frames(
+            start, stop, indices)
 
     def __len__(self):
-        return len(list(range(len(self._base)))[self._indices[0]])
+        return len(self._times)
 
     def _todict(self, savedir=None):
         return {
@@ -1027,33 +2793,536 @@ class _IndexedSequence(_WrapperSequence):
     #                   self.__dict__.keys())
 
 
-def _fill_gaps(frame_iter1, frame_iter2):
+class _CachedSequence(_WrapperSequence):
+
+    """Wraps any other sequence to cache its frames in memory.
+
+    Parameters
+    ----------
+    base : Sequence
+    max_bytes : int
+        The maximum size in bytes of the frames held in memory.
+    spill : bool
+        Whether frames evicted from memory are kept in a temporary
+        memory-mapped file.
+
+    This object has the same attributes and methods as the class it wraps."""
+
+    def __init__(self, base, max_bytes, spill=False):
+        super(_CachedSequence, self).__init__(base)
+        self._max_bytes = max_bytes
+        self._spill = spill
+        self._lock = threading.RLock()  # frames may be read by prefetching
+        self._frames = collections.OrderedDict()  # in order of last use
+        self._nbytes = 0
+        self._spill_array = None
+        self._spilled = None
+
+    def _lookup(self, t):
+        """Return the cached frame t, or None if it is not cached."""
+        with self._lock:
+            try:
+                frame = self._frames.pop(t)
+            except KeyError:
+                if self._spilled is not None and self._spilled[t]:
+                    frame = self._spill_array[t]
+                    frame.flags.writeable = False
+                    return frame
+                return None
+            self._frames[t] = frame  # mark as most recently used
+            return frame
+
+    def _store(self, t, frame):
+        """Add frame t to the cache, evicting the least recently used."""
+        frame.flags.writeable = False
+        with self._lock:
+            if t in self._frames:  # already stored by another thread
+                return self._frames[t]
+            if frame.nbytes > self._max_bytes:
+                self._evict(t, frame)
+                return frame
+            self._frames[t] = frame
+            self._nbytes += frame.nbytes
+            while self._nbytes > self._max_bytes:
+                evicted_t, evicted = self._frames.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+                self._evict(evicted_t, evicted)
+            return frame
+
+    def _evict(self, t, frame):
+        if not self._spill:
+            return
+        if self._spill_array is None:
+            self._spill_array = np.memmap(
+                tempfile.TemporaryFile(), dtype=frame.dtype, mode='w+',
+                shape=(len(self),) + frame.shape)
+            self._spilled = np.zeros(len(self), dtype=bool)
+        self._spill_array[t] = frame
+        self._spilled[t] = True
+
+    def _get_frame(self, t):
+        frame = self._lookup(t)
+        if frame is None:
+            frame = self._store(t, self._base._get_frame(t))
+        return frame
+
+    def get_frames(self, start, stop):
+        start, stop = _clip_block(start, stop, len(self))
+        frames = [self._lookup(t) for t in range(start, stop)]
+        missing = [t for t, f in zip(range(start, stop), frames) if f is None]
+        if missing:
+            block = self._base.get_frames(missing[0], missing[-1] + 1)
+            for t in missing:
+                # copy so that cached frames do not keep the block in memory
+                frames[t - start] = self._store(
+                    t, np.array(block[t - missing[0]]))
+        if not len(frames):
+            return np.empty((0,) + self.shape[1:])
+        return np.array(frames)
+
+    @property
+    def shape(self):
+        return self._base.shape
+
+    def __len__(self):
+        return len(self._base)
+
+    def _todict(self, savedir=None):
+        return {
+            '__class__': self.__class__,
+            'base': self._base._todict(savedir),
+            'max_bytes': self._max_bytes,
+            'spill': self._spill
+        }
+
+
+class _PrefetchSequence(_WrapperSequence):
+
+    """Wraps any other sequence to read ahead during iteration.
+
+    Parameters
+    ----------
+    base : Sequence
+    depth : int
+        The maximum number of frames or blocks read ahead.
+    workers : int or None
+        The number of threads used for reading.
+
+    This object has the same attributes and methods as the class it wraps."""
+
+    def __init__(self, base, depth=4, workers=None):
+        super(_PrefetchSequence, self).__init__(base)
+        if depth < 1:
+            raise ValueError('depth must be at least 1')
+        self._depth = depth
+        self._workers = workers
+
+    def _iter_async(self, func, args_iter):
+        """Yield func(*args) for each args, evaluated ahead in threads."""
+        pool = ThreadPool(self._workers)
+        pending = collections.deque()
+        try:
+            for args in args_iter:
+                pending.append(pool.apply_async(func, args))
+                if len(pending) >= self._depth:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+        finally:
+            pool.terminate()
+
+    def __iter__(self):
+        return self._iter_async(
+            self._base._get_frame, ((t,) for t in range(len(self))))
+
+    def iter_blocks(self, block_size=None):
+        if block_size is None:
+            block_size = _default_block_size(self.shape)
+        return self._iter_async(
+            self._base.get_frames,
+            ((start, start + block_size)
+             for start in range(0, len(self), block_size)))
+
+    def _get_frame(self, t):
+        return self._base._get_frame(t)
+
+    def get_frames(self, start, stop):
+        return self._base.get_frames(start, stop)
+
+    def _get_indexed_frames(self, start, stop, indices):
+        return self._base._get_indexed_frames(start, stop, indices)
+
+    @property
+    def shape(self):
+        return self._base.shape
+
+    def __len__(self):
+        return len(self._base)
+
+    def _todict(self, savedir=None):
+        return {
+            '__class__': self.__class__,
+            'base': self._base._todict(savedir),
+            'depth': self._depth,
+            'workers': self._workers
+        }
+
+
+class _BinnedSequence(_WrapperSequence):
+
+    """Wraps any other sequence to average blocks of frames and pixels.
+
+    Parameters
+    ----------
+    base : Sequence
+    t, y, x : int
+        The number of frames, rows and columns averaged together.
+
+    This object has the same attributes and methods as the class it wraps."""
+
+    def __init__(self, base, t=1, y=1, x=1):
+        super(_BinnedSequence, self).__init__(base)
+        if min(t, y, x) < 1:
+            raise ValueError('Bin sizes must be at least 1')
+        self._bins = (t, 1, y, x, 1)
+
+    @property
+    def shape(self):
+        return tuple(-(-n // b) for n, b in zip(self._base.shape, self._bins))
+
+    def __len__(self):
+        return -(-len(self._base) // self._bins[0])
+
+    def __iter__(self):
+        for frames in self.iter_blocks():
+            for frame in frames:
+                yield frame
+
+    def iter_blocks(self, block_size=None):
+        if block_size is None:
+            # about 64 MB of frames of the base sequence
+            block_size = max(1, _default_block_size(self._base.shape) //
+                             self._bins[0])
+        return super(_BinnedSequence, self).iter_blocks(block_size)
+
+    def _get_frame(self, t):
+        if not 0 <= t < len(self):
+            raise IndexError('Frame index out of range')
+        return self.get_frames(t, t + 1)[0]
+
+    def get_frames(self, start, stop):
+        return self._get_indexed_frames(start, stop, ())
+
+    def _get_indexed_frames(self, start, stop, indices):
+        """Read and bin the selected data.
+
+        Slices of rows and columns with unit step are converted to the
+        corresponding pixels of the base sequence, and indices of planes and
+        channels are passed on, so that only the selected data are read.
+        """
+        start, stop = _clip_block(start, stop, len(self))
+        base_indices, remaining = [], [slice(None)]
+        for n, b, idx in zip(self.shape[1:], self._bins[1:],
+                             _expand_indices(indices)):
+            if b == 1:
+                base_indices.append(idx)
+                remaining.append(slice(None))
+            elif isinstance(idx, slice) and idx.step in (None, 1):
+                low, high = idx.indices(n)[:2]
+                base_indices.append(slice(low * b, max(low, high) * b))
+                remaining.append(slice(None))
+            else:
+                base_indices.append(slice(None))
+                remaining.append(idx)
+        frames = self._base._get_indexed_frames(
+            start * self._bins[0], stop * self._bins[0], tuple(base_indices))
+        frames = _bin_block(frames, self._bins)
+        if any(idx != slice(None) for idx in remaining):
+            frames = frames[tuple(remaining)]
+        return frames
+
+    def _todict(self, savedir=None):
+        return {
+            '__class__': self.__class__,
+            'base': self._base._todict(savedir),
+            't': self._bins[0],
+            'y': self._bins[2],
+            'x': self._bins[3],
+        }
+
+
+def _bin_block(frames, bins):
+    """Average a block of frames over bins of the given size along each
+    dimension, ignoring NaN. Incomplete bins are averaged over the values
+    they contain."""
+    dtype = frames.dtype if frames.dtype.kind == 'f' else np.dtype(float)
+    padded_shape = [-(-n // b) * b for n, b in zip(frames.shape, bins)]
+    if list(frames.shape) != padded_shape:
+        padded = np.full(padded_shape, np.nan, dtype=dtype)
+        padded[tuple(slice(0, n) for n in frames.shape)] = frames
+        frames = padded
+    frames = frames.reshape(list(it.chain.from_iterable(
+        (n // b, b) for n, b in zip(frames.shape, bins))))
+    axes = tuple(range(1, frames.ndim, 2))
+    if frames.dtype.kind != 'f':  # no missing values
+        return frames.mean(axis=axes, dtype=dtype)
+    observed = np.isfinite(frames)
+    with np.errstate(invalid='ignore'):
+        return (np.where(observed, frames, 0).sum(axis=axes) /
+                observed.sum(axis=axes)).astype(dtype, copy=False)
+
+
+def _clip_block(start, stop, length):
+    """Clip the bounds of a block of frames to the length of a Sequence."""
+    if start < 0:
+        raise IndexError('Negative frame indices are not supported')
+    return start, max(start, min(stop, length))
+
+
+def _paste(out, origin, data, offset):
+    """Copy data into out where they overlap.
+
+    The leading dimensions of out and data start at the positions origin
+    and offset, respectively, of a common coordinate system.
+    """
+    src, dst = [], []
+    for o, out_len, d, data_len in zip(origin, out.shape, offset, data.shape):
+        low, high = max(o, d), min(o + out_len, d + data_len)
+        if high <= low:
+            return
+        src.append(slice(low - d, high - d))
+        dst.append(slice(low - o, high - o))
+    out[tuple(dst)] = data[tuple(src)]
+
+
+def _expand_indices(indices):
+    """Pad frame indices to one index per (plane, row, column, channel)."""
+    indices = tuple(indices)
+    return indices + (slice(None),) * (4 - len(indices))
+
+
+def _frame_indices(indices):
+    """Prepare the frame indices of an _IndexedSequence for the backends.
+
+    A single list of evenly spaced increasing indices, such as a list of
+    channels, is replaced by the equivalent slice, so that backends can
+    avoid reading the unselected data.
+    """
+    indices = _expand_indices(indices)
+    arrays = [k for k, idx in enumerate(indices)
+              if not isinstance(idx, slice)]
+    if len(arrays) != 1:
+        return indices
+    k = arrays[0]
+    idx = np.asarray(indices[k])
+    if idx.ndim != 1 or idx.dtype.kind not in 'iu' or not len(idx) or \
+            idx[0] < 0:
+        return indices
+    step = idx[1] - idx[0] if len(idx) > 1 else 1
+    if step < 1 or np.any(np.diff(idx) != step):
+        return indices
+    return indices[:k] + \
+        (slice(int(idx[0]), int(idx[-1]) + 1, int(step)),) + indices[k + 1:]
+
+
+def _write_tiff_pages(tiff_file, pages, dtype):
+    """Write images as pages of a TiffFileWriter after conversion to dtype."""
+    for page in pages:
+        tiff_file.write_page(page.astype(dtype))
+
+
+def _iter_blocks(frames, block_size):
+    """Group an iterable of frames into blocks of consecutive frames."""
+    block = []
+    for frame in frames:
+        block.append(frame)
+        if len(block) == block_size:
+            yield np.array(block)
+            block = []
+    if len(block):
+        yield np.array(block)
+
+
+def _default_block_size(shape):
+    """The number of frames in blocks of about 64 MB of float64 data."""
+    return max(1, 2 ** 23 // int(np.prod(shape[1:])))
+
+
+def _set_dtype(d, dtype):
+    """Set the dtype of the data sources underlying a Sequence dictionary."""
+    if 'base' in d:
+        _set_dtype(d['base'], dtype)
+    elif 'sequences' in d:
+        for sequence in d['sequences']:
+            _set_dtype(sequence, dtype)
+    else:
+        d['dtype'] = dtype
+
+
+def _as_dtype(dtype):
+    """Convert a dtype argument to a numpy dtype, preserving None."""
+    return None if dtype is None else np.dtype(dtype)
+
+
+def _astype(array, dtype):
+    """Convert an array to a dtype, or return it unchanged if dtype is None.
+
+    The returned array is always a new array when a dtype is given, so that
+    it can be safely modified by the caller.
+    """
+    if dtype is None:
+        return array
+    return np.array(array, dtype=dtype)
+
+
+def _fill_gaps(sequence, max_buffered=None):
     """Fill missing rows in the corrected images with data from nearby times.
 
+    Missing values are replaced by the most recent observation of the same
+    pixel or, before the pixel has been observed, by its first observation.
+    The frames are read in a single pass: the leading frames are buffered
+    until every pixel has been observed. Only if this takes more than
+    max_buffered frames is the start of the sequence read a second time.
+
     Parameters
     ----------
-    frame_iter1 : iterator of list of array
-        The corrected frames (one list entry per channel).
-    frame_iter2 : iterator of list of array
-        The corrected frames (one list entry per channel).
+    sequence : Sequence
+        The corrected frames.
+    max_buffered : int, optional
+        The maximum number of frames held while looking ahead for the first
+        observation of each pixel. Defaults to about 64 MB of frames.
 
     Yields
     ------
-    list of array
+    array
         The corrected and filled frames.
     """
-    first_obs = next(frame_iter1)
-    for frame in frame_iter1:
-        for frame_chan, fobs_chan in zip(frame, first_obs):
-            fobs_chan[np.isnan(fobs_chan)] = frame_chan[np.isnan(fobs_chan)]
-        if all(np.all(np.isfinite(chan)) for chan in first_obs):
+    if max_buffered is None:
+        max_buffered = _default_block_size(sequence.shape)
+    frames = iter(sequence)
+    try:
+        first_frame = next(frames)
+    except StopIteration:
+        return
+    first_obs = np.array(first_frame, dtype=float)
+    buffered = [first_frame]
+    missing = np.isnan(first_obs)
+    for frame in frames if missing.any() else ():
+        first_obs[missing] = frame[missing]
+        missing = np.isnan(first_obs)
+        if buffered is not None:
+            buffered.append(frame)
+            if len(buffered) > max_buffered:
+                # give up on the look-ahead and re-read the frames below
+                buffered = None
+        if not missing.any():
             break
-    most_recent = [x * np.nan for x in first_obs]
-    for frame in frame_iter2:
-        for fr_chan, mr_chan in zip(frame, most_recent):
-            mr_chan[np.isfinite(fr_chan)] = fr_chan[np.isfinite(fr_chan)]
-        yield [np.nan_to_num(mr_ch) + np.isnan(mr_ch) * fo_ch
-               for mr_ch, fo_ch in zip(most_recent, first_obs)]
+    if buffered is None:
+        frames = iter(sequence)
+    else:
+        frames = it.chain(buffered, frames)
+    most_recent = first_obs * np.nan
+    for frame in frames:
+        observed = np.isfinite(frame)
+        most_recent[observed] = frame[observed]
+        yield np.where(np.isnan(most_recent), first_obs, most_recent)
+
+
+class _SidecarFiles(object):
+
+    """The sidecar files of the sequences saved to a dataset directory.
+
+    Sequences that store data in files of their own in the dataset
+    directory, such as the arrays of ndarray sequences and the
+    displacements of motion-corrected sequences, name these files with the
+    _SidecarFiles of the ImagingDataset.save in progress. The names only
+    depend on the order in which the sequences are saved, so that saving a
+    dataset again replaces its files, and ImagingDataset.save removes the
+    sidecar files that are no longer used.
+
+    Parameters
+    ----------
+    savedir : str
+        The dataset directory.
+    """
+
+    _PATTERN = re.compile(r'(sequence|displacements)_\w+\.npy$')
+    _local = threading.local()
+
+    def __init__(self, savedir):
+        self.savedir = abspath(savedir)
+        self.paths = []  # the sidecar files, in the order they were named
+        self.referenced = set()  # other files of the saved sequences
+
+    @classmethod
+    def current(cls, savedir):
+        """The sidecar files of the dataset being saved to savedir, or new
+        _SidecarFiles if no dataset is being saved there."""
+        files = getattr(cls._local, 'files', None)
+        if files is None or files.savedir != abspath(savedir):
+            files = cls(savedir)
+        return files
+
+    def __enter__(self):
+        self._previous = getattr(self._local, 'files', None)
+        self._local.files = self
+        return self
+
+    def __exit__(self, *exc_info):
+        self._local.files = self._previous
+
+    def write(self, prefix, save, mapped_file=None):
+        """Name the next sidecar file with the prefix and write it.
+
+        Parameters
+        ----------
+        prefix : str
+            'sequence' or 'displacements'.
+        save : callable
+            Writes the data to the .npy path passed to it.
+        mapped_file : tuple, optional
+            The (path, identity) of the file from which the data are
+            memory-mapped. The file is not rewritten if it is the named
+            file and has not changed since it was mapped.
+
+        Returns
+        -------
+        str
+            The path of the sidecar file.
+        """
+        index = sum(1 for p in self.paths
+                    if basename(p).startswith(prefix + '_'))
+        path = join(self.savedir, '{}_{}.npy'.format(prefix, index))
+        self.paths.append(path)
+        if mapped_file != (path, _file_identity(path)):
+            # replaced rather than overwritten, as the old file may be
+            # memory-mapped by another sequence
+            tmp_path = path[:-len('.npy')] + '.tmp.npy'
+            save(tmp_path)
+            sima.misc.replace_file(tmp_path, path)
+        return path
+
+    def remove_unused(self):
+        """Remove the sidecar files in the directory that were not named
+        or referenced while saving."""
+        used = set(self.paths) | self.referenced
+        for filename in os.listdir(self.savedir):
+            path = join(self.savedir, filename)
+            if self._PATTERN.match(filename) and path not in used:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def _file_identity(path):
+    """The (inode, modification time, size) of a file, or None."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, getattr(stat, 'st_mtime_ns', stat.st_mtime),
+            stat.st_size)
 
 
 def _resolve_paths(d, savedir):
@@ -1077,7 +3346,7 @@ def _resolve_paths(d, savedir):
     except KeyError:
         pass
     if len(paths):
-        valid_paths = list(filter(isfile, paths))
+        valid_paths = list(filter(exists, paths))
         if not len(valid_paths):
             error_msg = (
                 'Data could not be found in either of the following '
@@ -1098,7 +3367,7 @@ def _resolve_paths(d, savedir):
         if len(valid_paths) is not 1:
             while True:
                 input_path = input(error_msg)
-                if isfile(input_path):
+                if exists(input_path):
                     valid_paths = [input_path]
                     break
                 else:
@@ -21,6 +21,7 @@ from numpy.testing import (
     assert_allclose)
 
 import os
+import pickle
 import shutil
 import sima
 import numpy as np
@@ -218,6 +219,68 @@ class Test_VaryingData(object):
             overlap_signals['raw'][0][1], roi2_expected_overlap)
 
 
+class Test_SignalStore(object):
+
+    def setup(self):
+        self.tmp_dir = os.path.join(os.path.dirname(__file__), 'tmp')
+        try:
+            os.mkdir(self.tmp_dir)
+        except OSError:
+            pass
+        path = os.path.join(self.tmp_dir, "test_signal_store.sima")
+        seq = sima.Sequence.create('ndarray', np.ones((10, 1, 6, 8, 1)))
+        self.dataset = sima.ImagingDataset([seq], savedir=path)
+        rois = [{'id': 'roi', 'label': 'roi', 'tags': set()}]
+        self.signals = {
+            label: {'raw': [np.random.rand(1, 10)],
+                    'rois': rois, 'signal_channel': 0,
+                    'timestamp': '2015-01-0{}-12h00m00s'.format(idx)}
+            for idx, label in enumerate(['a', 'b'])}
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_migration(self):
+        pkl_path = os.path.join(self.dataset.savedir, 'signals_0.pkl')
+        with open(pkl_path, 'wb') as f:
+            pickle.dump(self.signals, f)
+        store = self.dataset.signals()
+        assert_equal(sorted(store), ['a', 'b'])
+        assert_(not os.path.exists(pkl_path))
+        assert_(isinstance(store['a']['raw'][0], np.memmap))
+        assert_array_equal(store['a']['raw'][0], self.signals['a']['raw'][0])
+        assert_equal(store['b']['rois'], self.signals['b']['rois'])
+        assert_equal(sima.misc.most_recent_key(store), 'b')
+        self.dataset.export_signals(
+            os.path.join(self.tmp_dir, "export_signals_test.csv"))
+
+    def test_labels_stored_separately(self):
+        store = self.dataset.signals()
+        store['a'] = self.signals['a']
+        entry = os.path.join(store.path, store._load_index()['a']['directory'])
+        mtimes = {f: os.stat(os.path.join(entry, f)).st_mtime
+                  for f in os.listdir(entry)}
+        store['b'] = self.signals['b']
+        assert_equal({f: os.stat(os.path.join(entry, f)).st_mtime
+                      for f in os.listdir(entry)}, mtimes)
+        assert_equal(sorted(self.dataset.signals()), ['a', 'b'])
+        store['b'] = self.signals['a']
+        del store['a']
+        assert_(not os.path.exists(entry))
+        assert_equal(len(os.listdir(store.path)), 2)  # entry and index
+        assert_array_equal(self.dataset.signals()['b']['raw'],
+                           self.signals['a']['raw'])
+
+    def test_changes_by_other_instances(self):
+        store = self.dataset.signals()
+        store['a'] = self.signals['a']
+        assert_equal(list(store), ['a'])
+        self.dataset.signals()['b'] = self.signals['b']
+        assert_equal(sorted(store), ['a', 'b'])
+        del self.dataset.signals()['a']
+        assert_equal(list(store), ['b'])
+
+
 class Test_MissingData(object):
     def setup(self):
         pass
@@ -23,6 +23,7 @@ from sima import ImagingDataset, Sequence, ROI
 from sima.misc import example_hdf5, example_imagej_rois, example_tiffs
 import os
 import shutil
+import warnings
 # import tempfile
 import numpy as np
 from PIL import Image
@@ -93,6 +94,121 @@ class TestImagingDataset(object):
         averages2 = self.ds.time_averages
         assert_equal(self.ds.frame_shape, averages2.shape)
 
+    def test_statistics(self):
+        data = np.random.rand(13, 2, 6, 5, 2) * 100
+        data[2, 0, 1, 1] = np.nan
+        data[:, 1, 2, 3, 0] = np.nan
+        path = os.path.join(tmp_dir, 'test_statistics.sima')
+        ds = ImagingDataset([Sequence.create('ndarray', data[:8]),
+                             Sequence.create('ndarray', data[8:])], path)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            assert_allclose(ds.statistics.mean, np.nanmean(data, axis=0))
+            assert_allclose(ds.statistics.variance, np.nanvar(data, axis=0))
+            assert_allclose(ds.statistics.min, np.nanmin(data, axis=0))
+            assert_allclose(ds.statistics.max, np.nanmax(data, axis=0))
+            assert_allclose(ds.statistics.max_projection,
+                            np.nanmax(data, axis=(0, 1)))
+        assert_equal(ds.statistics.count, np.isfinite(data).sum(axis=0))
+        assert_allclose(ds.time_averages, ds.statistics.mean)
+        mean, variance = ds.statistics.channel_distribution()
+        assert_allclose(mean, [np.nanmean(data[..., c]) for c in range(2)])
+        assert_allclose(variance,
+                        [np.nanvar(data[..., c]) for c in range(2)])
+        # the statistics are saved with the dataset
+        assert_(os.path.exists(os.path.join(path, 'statistics.npz')))
+        loaded = ImagingDataset.load(path).statistics
+        assert_equal(loaded.num_frames, 13)
+        assert_allclose(loaded.variance, ds.statistics.variance)
+        shutil.rmtree(path)
+
+    def test_parallel_statistics(self):
+        import sima.sequence
+        data = np.random.rand(23, 2, 8, 7, 2)
+        data[3, 0, 1] = np.nan
+        sequences = [Sequence.create('ndarray', data[:15]),
+                     Sequence.create('ndarray', data[15:])]
+        default_block_size = sima.sequence._default_block_size
+        # split the frames into several blocks
+        sima.sequence._default_block_size = lambda shape: 4
+        try:
+            serial = ImagingDataset(sequences, None).statistics
+            parallel = ImagingDataset(
+                sequences, None, n_processes=3).statistics
+        finally:
+            sima.sequence._default_block_size = default_block_size
+        assert_equal(parallel.num_frames, 23)
+        for attr in ['count', 'mean', 'variance', 'min', 'max']:
+            assert_array_equal(getattr(parallel, attr),
+                               getattr(serial, attr))
+
+    def test_append_sequences(self):
+        data = np.random.rand(20, 1, 8, 7, 2)
+        path = os.path.join(tmp_dir, 'test_append_sequences.sima')
+        ds = ImagingDataset([Sequence.create('ndarray', data[:8])], path)
+        ds.time_averages
+
+        def fail(*args):
+            raise AssertionError('The existing frames were read')
+
+        ds.sequences[0].get_frames = ds.sequences[0]._get_frame = fail
+        ds.append_sequences([Sequence.create('ndarray', data[8:15]),
+                             Sequence.create('ndarray', data[15:])])
+        assert_equal((ds.num_sequences, ds.num_frames), (3, 20))
+        assert_allclose(ds.time_averages, data.mean(axis=0))
+        loaded = ImagingDataset.load(path)
+        assert_equal((loaded.num_sequences, loaded.num_frames), (3, 20))
+        assert_allclose(loaded.time_averages, data.mean(axis=0))
+        assert_equal(loaded.statistics.num_frames, 20)
+        assert_array_equal(
+            loaded.statistics.variance,
+            ImagingDataset(loaded.sequences, None).statistics.variance)
+        assert_raises(ValueError, loaded.append_sequences,
+                      [Sequence.create('ndarray', data[:, :, 1:])])
+        shutil.rmtree(path)
+
+    def test_dtype(self):
+        ds = ImagingDataset(self.ds.sequences, None, dtype='float32')
+        assert_equal(ds.sequences[0]._get_frame(0).dtype, np.float32)
+        assert_allclose(ds.time_averages, self.ds.time_averages, rtol=1e-5)
+
+    def test_ndarray_sidecar(self):
+        global tmp_dir
+        data = np.random.rand(6, 1, 8, 7, 2)
+        path = os.path.join(tmp_dir, 'test_ndarray_sidecar.sima')
+        ds = ImagingDataset([Sequence.create('ndarray', data)], path)
+        ds.save()
+        sidecars = [f for f in os.listdir(path) if f.endswith('.npy')]
+        assert_equal(len(sidecars), 1)
+        seq = ImagingDataset.load(path).sequences[0]
+        assert_(isinstance(seq._array, np.memmap))
+        assert_array_equal(np.array(seq), data)
+        # changes made to the array in place are saved
+        data[:] = 5
+        ds.save()
+        assert_equal(np.array(ImagingDataset.load(path).sequences[0]).max(),
+                     5)
+        # files of replaced sequences are removed
+        displacements = np.zeros((6, 1, 8, 2), dtype=int)
+        for _ in range(2):
+            ds.sequences = [Sequence.create('ndarray', data),
+                            Sequence.create('ndarray', data[:3])]
+            ds.sequences = [ds.sequences[0].apply_displacements(
+                displacements, (1, 8, 7)), ds.sequences[1]]
+            ds.save()
+        assert_equal(sorted(f for f in os.listdir(path)
+                            if f.endswith('.npy')),
+                     ['displacements_0.npy', 'sequence_0.npy',
+                      'sequence_1.npy'])
+        # saving the loaded sequences in a different order
+        loaded = ImagingDataset.load(path)
+        loaded.sequences = loaded.sequences[::-1]
+        loaded.save()
+        sequences = ImagingDataset.load(path).sequences
+        assert_array_equal(np.array(sequences[0]), data[:3])
+        assert_array_equal(np.array(sequences[1]), data)
+        shutil.rmtree(path)
+
     def test_export_averages_tiff16(self):
         time_avg_path = os.path.join(self.filepath, 'time_avg_Ch2.tif')
         self.ds.export_averages(
@@ -140,8 +256,33 @@ class TestImagingDataset(object):
         # This should quietly do nothing
         self.ds.delete_ROIs('foo')
 
+    def test_roi_store(self):
+        rois = ROI.ROIList.load(example_imagej_rois(), fmt='ImageJ')
+        rois.save(os.path.join(self.filepath, 'rois.pkl'), 'old')
+        # ROIs saved in a single pickle file are migrated
+        assert_equal(list(self.ds.ROIs), ['old'])
+        assert_(not os.path.exists(os.path.join(self.filepath, 'rois.pkl')))
+        # each access returns a new ROIList
+        old = self.ds.ROIs['old']
+        old.pop()
+        assert_equal(len(self.ds.ROIs['old']), 2)
+        self.ds.add_ROIs(rois, 'new')
+        assert_equal(len(os.listdir(os.path.join(self.filepath, 'rois'))), 3)
+        # changes made by other instances are detected
+        ImagingDataset.load(self.filepath).add_ROIs(rois[:1], 'old')
+        assert_equal(len(self.ds.ROIs['old']), 1)
+        assert_equal(len(self.ds.ROIs['new']), 2)
+        # ROIs saved to rois.pkl after the migration are also migrated
+        rois.save(os.path.join(self.filepath, 'rois.pkl'), 'old')
+        assert_equal(sorted(self.ds.ROIs), ['new', 'old'])
+        assert_equal(len(self.ds.ROIs['old']), 2)
+        assert_(not os.path.exists(os.path.join(self.filepath, 'rois.pkl')))
+
     def test_rois(self):
         assert_equal(len(self.ds.ROIs), 0)
+        unsaved = ImagingDataset(self.ds.sequences, None)
+        assert_equal(len(unsaved.ROIs), 0)
+        assert_equal(unsaved.ROIs.index, {})
 
     # @dec.knownfailureif(True)
     # def test_import_transformed_rois(self):
@@ -0,0 +1,59 @@
+# Unit tests for the time taken by `import sima`
+# Tests follow conventions for NumPy/SciPy avialble at
+# https://github.com/numpy/numpy/blob/master/doc/TESTS.rst.txt
+
+# use assert_() and related functions over the built in assert to ensure tests
+# run properly, regaurdless of how python is started.
+from numpy.testing import assert_, assert_equal, run_module_suite
+
+import json
+import subprocess
+import sys
+
+# Heavy or optional dependencies that should only be imported when the
+# features that need them are used.
+LAZY_MODULES = ['cv2', 'distutils', 'h5py', 'matplotlib', 'mdp', 'PIL',
+                'shapely', 'skimage', 'sklearn']
+
+# Upper bound, in seconds, on the time taken by `import sima` in a new
+# interpreter, after numpy has been imported.
+IMPORT_TIME_BUDGET = 1.0
+
+_SCRIPT = """
+import json, sys, time
+import numpy
+start = time.time()
+import sima
+elapsed = time.time() - start
+modules = sorted(set(m.split('.')[0] for m in sys.modules))
+print(json.dumps({'time': elapsed, 'modules': modules}))
+"""
+
+
+def _import_sima():
+    output = subprocess.check_output([sys.executable, '-c', _SCRIPT])
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def test_lazy_modules():
+    modules = _import_sima()['modules']
+    assert_equal([m for m in LAZY_MODULES if m in modules], [])
+
+
+def test_lazy_submodules():
+    script = ("import sys, sima; loaded = 'sima.ROI' in sys.modules; "
+              "sima.ROI.ROIList, sima.extract.extract_rois; "
+              "print(loaded, type(sima.ROI) is type(sys))")
+    output = subprocess.check_output([sys.executable, '-c', script])
+    assert_equal(output.decode().split()[-2:], ['False', 'True'])
+
+
+def test_import_time():
+    # take the best of several runs to reduce the effect of system load
+    import_time = min(_import_sima()['time'] for _ in range(3))
+    assert_(import_time < IMPORT_TIME_BUDGET,
+            '`import sima` took {:.2f}s'.format(import_time))
+
+
+if __name__ == "__main__":
+    run_module_suite()
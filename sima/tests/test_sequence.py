@@ -18,18 +18,76 @@ from numpy.testing import (
     run_module_suite,
     assert_allclose)
 
+import os
+import shutil
+import struct
+import warnings
+import zlib
+
 import numpy as np
 
 import sima
-from sima.misc import example_tiffs, example_tiff
+from sima.misc import example_tiffs, example_tiff, example_hdf5
+from sima.sequence import (
+    _Sequence_TIFF_Interleaved, _Sequence_TIFF_Memmap, _tiff_page_index,
+    _fill_gaps, _RunLengthDisplacements)
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from sima.misc.tifffile import imsave
+
+tmp_dir = None
+
+
+def _write_striped_tiff(path, pages, rows_per_strip):
+    """Write uint16 pages as a deflate-compressed TIFF with several strips
+    per page."""
+    with open(path, 'wb') as f:
+        f.write(b'II' + struct.pack('<HI', 42, 0))
+        next_ifd = 4
+        for page in pages:
+            strips = [zlib.compress(page[i:i + rows_per_strip].tobytes())
+                      for i in range(0, len(page), rows_per_strip)]
+            offsets = []
+            for strip in strips:
+                offsets.append(f.tell())
+                f.write(strip)
+            arrays = f.tell()
+            f.write(struct.pack('<%dI' % len(strips), *offsets))
+            f.write(struct.pack('<%dI' % len(strips), *map(len, strips)))
+            ifd = f.tell()
+            tags = [(256, 3, 1, page.shape[1]), (257, 3, 1, page.shape[0]),
+                    (258, 3, 1, 16), (259, 3, 1, 8), (262, 3, 1, 1),
+                    (273, 4, len(strips), arrays), (277, 3, 1, 1),
+                    (278, 3, 1, rows_per_strip),
+                    (279, 4, len(strips), arrays + 4 * len(strips))]
+            f.write(struct.pack('<H', len(tags)))
+            for code, dtype, count, value in tags:
+                f.write(struct.pack('<HHI' + ('HH' if dtype == 3 else 'I'),
+                                    code, dtype, count, value,
+                                    *([0] if dtype == 3 else [])))
+            f.write(struct.pack('<I', 0))
+            end = f.tell()
+            f.seek(next_ifd)
+            f.write(struct.pack('<I', ifd))
+            next_ifd = ifd + 2 + 12 * len(tags)
+            f.seek(end)
 
 
 def setup():
-    return
+    global tmp_dir
+
+    tmp_dir = os.path.join(os.path.dirname(__file__), 'tmp')
+
+    try:
+        os.mkdir(tmp_dir)
+    except OSError:
+        pass
 
 
 def teardown():
-    return
+    global tmp_dir
+
+    shutil.rmtree(tmp_dir)
 
 
 class TestSequence(object):
@@ -45,22 +103,454 @@ class TestSequence(object):
                       [example_tiffs(), example_tiffs()]])
         assert_equal(seq.shape, (3, 4, 173, 173, 2))
 
+    def test_tiffs_parallel(self):
+        from PIL import Image
+        seq = sima.Sequence.create(
+            'TIFFs', [[example_tiffs(), example_tiffs()]], workers=3)
+        paths = seq._paths[:, 0, 0]
+        for t, frame in enumerate(seq):
+            image = np.array(Image.open(paths[t]))
+            assert_array_equal(frame[0, :, :, 0], image)
+            assert_array_equal(frame[0, :, :, 1], image)
+        assert_array_equal(seq.get_frames(1, 3), np.array(seq)[1:3])
+        assert_equal(len(seq._page_indices), len(paths))
+
     def test_get_frame_tiff(self):
         it = iter(self.tiff_seq)
         assert_array_equal(next(it), self.tiff_seq._get_frame(0))
         assert_array_equal(next(it), self.tiff_seq._get_frame(1))
 
-    # @dec.knownfailureif(True)
-    # def test_export_hdf5(self):
-    #     raise NotImplemented
-
-    # @dec.knownfailureif(True)
-    # def test_export_tiff8(self):
-    #     raise NotImplemented
-
-    # @dec.knownfailureif(True)
-    # def test_export_tiff16(self):
-    #     raise NotImplemented
+    def test_tiff_memmap(self):
+        assert_(isinstance(self.tiff_seq, _Sequence_TIFF_Memmap))
+        decoded = _Sequence_TIFF_Interleaved(example_tiff(), 2, 2)
+        assert_equal(self.tiff_seq.shape, decoded.shape)
+        assert_array_equal(np.array(self.tiff_seq), np.array(decoded))
+        frame = self.tiff_seq._get_frame(2)
+        assert_equal(frame.dtype, np.dtype(float))
+        assert_(frame.flags.writeable)
+        native = sima.Sequence.create('TIFF', example_tiff(), 2, 2,
+                                      dtype=None)
+        frame = native._get_frame(2)
+        assert_(isinstance(frame, np.memmap))
+        assert_(not frame.flags.writeable)
+        assert_(isinstance(next(iter(native[1:3, :, 10:20])), np.memmap))
+
+    def test_tiff_compressed_fallback(self):
+        global tmp_dir
+        data = np.arange(8 * 16 * 16).reshape(8, 16, 16).astype('uint16')
+        path = os.path.join(tmp_dir, 'compressed.tif')
+        imsave(path, data, compress=6)
+        iter_tiff_ifds = sima.sequence._iter_tiff_ifds
+        calls = []
+
+        def counting_iter_tiff_ifds(fh):
+            calls.append(fh)
+            return iter_tiff_ifds(fh)
+        sima.sequence._iter_tiff_ifds = counting_iter_tiff_ifds
+        try:
+            seq = sima.Sequence.create('TIFF', path, 1, 2)
+            assert_(not isinstance(seq, _Sequence_TIFF_Memmap))
+            assert_equal(seq.shape, (4, 1, 16, 16, 2))
+        finally:
+            sima.sequence._iter_tiff_ifds = iter_tiff_ifds
+        assert_equal(len(calls), 1)  # the file is only indexed once
+        assert_array_equal(np.array(seq)[:, 0, :, :, 1], data[1::2])
+
+    def test_tiff_page_index(self):
+        global tmp_dir
+        data = np.arange(6 * 16 * 16).reshape(6, 16, 16).astype('uint16')
+        path = os.path.join(tmp_dir, 'indexed.tif')
+        imsave(path, data, compress=6)
+        seq = sima.Sequence.create('TIFF', path, 3, 1)
+        assert_array_equal(seq._get_frame(1)[..., 0], data[3:])
+        index = seq._todict()['page_index']
+        assert_equal(index['offsets'].shape[0], 6)
+        assert_(_tiff_page_index(path, index) is index)
+
+        seq = sima.Sequence.create('TIFF', path, 3, 1, page_index=index)
+        assert_array_equal(seq._get_frame(0)[..., 0], data[:3])
+
+        imsave(path, data[:5], compress=6)
+        new_index = _tiff_page_index(path, index)
+        assert_equal(new_index['offsets'].shape[0], 5)
+
+    def test_tiff_rows_per_strip(self):
+        global tmp_dir
+        # the page height is not a multiple of the rows per strip
+        data = np.arange(4 * 10 * 7).reshape(4, 10, 7).astype('uint16')
+        path = os.path.join(tmp_dir, 'striped.tif')
+        _write_striped_tiff(path, data, 6)
+        seq = sima.Sequence.create('TIFF', path, 1, 2)
+        assert_(not isinstance(seq, _Sequence_TIFF_Memmap))
+        assert_equal(seq._get_page_index()['rows_per_strip'], 6)
+        assert_array_equal(np.array(seq)[:, 0, :, :, 0], data[::2])
+        for rows in [slice(5, 9), slice(0, 6), slice(6, 10), slice(3, 4)]:
+            assert_array_equal(np.array(seq[:, :, rows])[:, 0, :, :, 1],
+                               data[1::2, rows])
+
+    def test_tiff_len_from_headers(self):
+        global tmp_dir
+        data = np.arange(7 * 16 * 16).reshape(7, 16, 16).astype('uint16')
+        path = os.path.join(tmp_dir, 'counted.tif')
+        imsave(path, data, compress=6)
+        seq = sima.Sequence.create('TIFF', path, 1, 2)
+        seq._iter_pages = None  # pixel data must not be needed
+        assert_equal(len(seq), 3)
+        assert_equal(seq.shape, (3, 1, 16, 16, 2))
+        assert_equal(seq._todict()['len_'], 3)
+
+    def test_tiff_imagej_stack(self):
+        global tmp_dir
+        data = np.arange(6 * 8 * 8).reshape(6, 8, 8).astype('uint16')
+        path = os.path.join(tmp_dir, 'imagej.tif')
+        # ImageJ writes a single IFD for stacks larger than 4 GB
+        imsave(path, data[0], description='ImageJ=1.48\nimages=6\n')
+        with open(path, 'ab') as f:
+            f.write(data[1:].tobytes())
+        seq = sima.Sequence.create('TIFF', path, 3)
+        assert_equal(seq.shape, (2, 3, 8, 8, 1))
+        assert_array_equal(np.array(seq)[..., 0].reshape(data.shape), data)
+
+    def test_tiff_stack(self):
+        global tmp_dir
+        data = np.random.randint(0, 60000, (7, 2, 9, 8, 3)).astype('uint16')
+        pages = data.transpose(0, 1, 4, 2, 3).reshape(-1, 9, 8)
+        stack_dir = os.path.join(tmp_dir, 'tiff_stack')
+        os.mkdir(stack_dir)
+        # frames continue across files, one of which is compressed
+        for i, (first, last) in enumerate([(0, 5), (5, 17), (17, 18),
+                                           (18, 42)]):
+            imsave(os.path.join(stack_dir, 'file_%05d.tif' % i),
+                   pages[first:last], compress=6 if i == 1 else 0)
+        seq = sima.Sequence.create(
+            'TIFF stack', os.path.join(stack_dir, 'file_*.tif'), 2, 3)
+        assert_equal(seq.shape, data.shape)
+        assert_array_equal(np.array(seq), data)
+        assert_array_equal(seq._get_frame(2), data[2])
+        assert_array_equal(seq.get_frames(1, 4), data[1:4])
+        assert_array_equal(np.array(seq[:, 1, 2:5, :, 1:]),
+                           data[:, 1:2, 2:5, :, 1:])
+        d = seq._todict(tmp_dir)
+        assert_equal(d['_relpaths'][0], os.path.join('tiff_stack',
+                                                     'file_00000.tif'))
+        loaded = d.pop('__class__')._from_dict(d, tmp_dir)
+        assert_array_equal(loaded.get_frames(3, 7), data[3:7])
+
+    def test_get_frames(self):
+        global tmp_dir
+        hdf5_seq = sima.Sequence.create('HDF5', example_hdf5(), 'yxt')
+        chunked_path = os.path.join(tmp_dir, 'get_frames.chunked')
+        hdf5_seq.export(chunked_path, fmt='chunked', compression='zlib',
+                        chunks=(3, 1, 50, 256, 1))
+        displacements = np.random.randint(0, 3, (20, 1, 1, 2)) * np.ones(
+            (20, 1, 128, 2), dtype=int)
+        sequences = [
+            sima.Sequence.create('ndarray', np.random.rand(13, 2, 4, 5, 2)),
+            hdf5_seq,
+            self.tiff_seq,
+            _Sequence_TIFF_Interleaved(example_tiff(), 1, 2),
+            self.tiff_seq.mask([(1, 0, None, 1)]),
+            hdf5_seq[2:17, :, 10:50],
+            hdf5_seq[1:17:3],
+            sima.Sequence.join(hdf5_seq, hdf5_seq),
+            hdf5_seq.apply_displacements(displacements, (1, 130, 258)),
+            hdf5_seq.cached(2 ** 20),
+            hdf5_seq.prefetch(3, 2),
+            hdf5_seq.bin(t=3, y=2),
+            sima.Sequence.create('TIFFs', [[example_tiffs()]]),
+            sima.Sequence.create('chunked', chunked_path),
+        ]
+        for seq in sequences:
+            frames = np.array([frame for frame in seq])
+            assert_array_equal(seq.get_frames(1, 4), frames[1:4])
+            assert_array_equal(
+                np.concatenate(list(seq.iter_blocks(2))), frames)
+            assert_equal(seq.get_frames(len(seq), len(seq) + 2).shape,
+                         (0,) + frames.shape[1:])
+
+    def test_indexed_frames(self):
+        global tmp_dir
+        data = np.arange(8 * 16 * 16).reshape(8, 16, 16).astype('uint16')
+        path = os.path.join(tmp_dir, 'strips.tif')
+        imsave(path, data, compress=6)
+        hdf5_seq = sima.Sequence.create('HDF5', example_hdf5(), 'yxt')
+        sequences = [
+            sima.Sequence.create('ndarray', np.random.rand(9, 2, 16, 16, 2)),
+            hdf5_seq,
+            self.tiff_seq,
+            _Sequence_TIFF_Interleaved(example_tiff(), 2, 2),
+            sima.Sequence.create('TIFF', path, 2, 2),
+            sima.Sequence.join(hdf5_seq, hdf5_seq),
+            sima.Sequence.create('TIFFs', [[example_tiffs()]]),
+        ]
+        indices = [(slice(None), slice(None), slice(3, 11)),
+                   (slice(None), slice(None), slice(None), slice(None, 7)),
+                   (slice(None), slice(None), slice(None), slice(None), [0]),
+                   (slice(1, 3), 0, slice(2, 12, 3), slice(2, 9), 0),
+                   (slice(None, None, 2), slice(None), slice(None, None, -2)),
+                   (slice(None), slice(1, None), slice(4, 9),
+                    slice(None), slice(1, None))]
+        for seq in sequences:
+            frames = np.array([frame for frame in seq])
+            for idx in indices:
+                expected = frames[
+                    tuple(slice(i, i + 1) if isinstance(i, int) else i
+                          for i in idx)]
+                indexed = seq[idx]
+                assert_equal(len(indexed), len(expected))
+                assert_array_equal(np.array([f for f in indexed]), expected)
+                assert_array_equal(indexed.get_frames(0, 2), expected[:2])
+
+    def test_fused_alignment(self):
+        base = sima.Sequence.create(
+            'ndarray', np.random.rand(6, 2, 16, 12, 2)).mask(
+                [(None, np.random.rand(2, 16, 12) > 0.8, 1), (2, 1, None, 0)])
+        displacements = [np.random.randint(0, 3, (6, 2, 16, 2)),
+                         np.random.randint(0, 3, (6, 2, 3)),
+                         np.random.randint(0, 3, (6, 2, 2)),
+                         np.random.randint(0, 3, (6, 3))]
+        indices = [(slice(None), slice(None), slice(2, 15), slice(1, 12)),
+                   (slice(1, 5), 1, slice(None, 10), slice(3, None), 1),
+                   (slice(None), slice(None), slice(16, None), slice(None), 0)]
+        for disps in displacements:
+            corrected = base.apply_displacements(disps, (4, 18, 14))
+            frames = np.array([frame for frame in corrected])
+            for idx in indices:
+                expected = frames[
+                    tuple(slice(i, i + 1) if isinstance(i, int) else i
+                          for i in idx)]
+                assert_array_equal(
+                    np.array([f for f in corrected[idx]]), expected)
+
+    def test_bin(self):
+        data = np.random.rand(7, 2, 6, 5, 2)
+        data[1, 0, 2, 3, 1] = np.nan
+        data[4:6, 1, :2, :2, 0] = np.nan
+        data[6, 0, 4:, 4:, 1] = np.nan  # an empty bin
+        binned = sima.Sequence.create('ndarray', data).bin(t=3, y=2, x=2)
+        assert_equal(binned.shape, (3, 2, 3, 3, 2))
+        expected = np.empty(binned.shape)
+        for t, y, x in np.ndindex(3, 3, 3):
+            block = data[3 * t:3 * t + 3, :, 2 * y:2 * y + 2, 2 * x:2 * x + 2]
+            for z, c in np.ndindex(2, 2):
+                values = block[:, z, :, :, c]
+                values = values[np.isfinite(values)]
+                expected[t, z, y, x, c] = \
+                    values.mean() if len(values) else np.nan
+        assert_allclose(np.array(binned), expected)
+        assert_(np.isnan(expected[2, 0, 2, 2, 1]))
+        assert_allclose(binned.get_frames(1, 3), expected[1:3])
+        assert_allclose(np.array(binned[:, 1, 1:, :, 0]),
+                        expected[:, 1:2, 1:, :, :1])
+        float32 = sima.Sequence.create('ndarray', data, dtype='float32')
+        assert_equal(float32.bin(t=2)._get_frame(0).dtype, np.float32)
+
+    def test_cached(self):
+        data = np.random.rand(10, 2, 4, 5, 2)
+        frame_bytes = data[0].nbytes
+        for max_bytes, spill, num_reads in [(10 * frame_bytes, False, 10),
+                                            (3 * frame_bytes, False, 20),
+                                            (3 * frame_bytes, True, 10)]:
+            base = sima.Sequence.create('ndarray', data)
+            reads = []
+            get_frame = base._get_frame
+
+            def counting_get_frame(t):
+                reads.append(t)
+                return get_frame(t)
+            base._get_frame = counting_get_frame
+            seq = base.cached(max_bytes, spill=spill)
+            for _ in range(2):
+                assert_array_equal(np.array([f for f in seq]), data)
+            assert_equal(len(reads), num_reads)
+            assert_(seq._nbytes <= max_bytes)
+            assert_array_equal(seq.get_frames(2, 8), data[2:8])
+            assert_(not seq._get_frame(9).flags.writeable)
+
+    def test_prefetch(self):
+        base = sima.Sequence.create('HDF5', example_hdf5(), 'yxt')
+        displacements = np.random.randint(0, 3, (20, 1, 128, 2))
+        corrected = base.apply_displacements(displacements, (1, 130, 258))
+        seq = corrected.prefetch(depth=4, workers=3)
+        assert_array_equal(np.array([f for f in seq]),
+                           np.array([f for f in corrected]))
+        assert_array_equal(np.concatenate(list(seq.iter_blocks(3))),
+                           np.concatenate(list(corrected.iter_blocks(3))))
+        # stopping early must not leave the reading threads waiting
+        for i, frame in enumerate(seq):
+            if i == 2:
+                break
+        assert_raises(ValueError, base.prefetch, 0)
+
+    def test_dtype(self):
+        hdf5_seq = sima.Sequence.create(
+            'HDF5', example_hdf5(), 'yxt', dtype='float32')
+        tiff_seq = sima.Sequence.create(
+            'TIFF', example_tiff(), 2, 2, dtype='float32')
+        for seq in [hdf5_seq, tiff_seq, self.tiff_seq.astype('float32')]:
+            assert_equal(seq._get_frame(0).dtype, np.float32)
+            assert_equal(seq.get_frames(0, 2).dtype, np.float32)
+            assert_equal(next(iter(seq)).dtype, np.float32)
+        assert_array_equal(tiff_seq._get_frame(1), self.tiff_seq._get_frame(1))
+        row_disps = np.random.randint(0, 3, (20, 1, 128, 2))
+        frame_disps = np.random.randint(0, 3, (20, 3))
+        for disps in [row_disps, frame_disps]:
+            corrected = hdf5_seq.apply_displacements(disps, (1, 130, 258))
+            corrected64 = corrected.astype(float)
+            assert_equal(corrected._get_frame(3).dtype, np.float32)
+            assert_equal(corrected64._get_frame(3).dtype, np.float64)
+            assert_allclose(corrected._get_frame(3),
+                            corrected64._get_frame(3), rtol=1e-6)
+
+    def test_export_hdf5(self):
+        global tmp_dir
+        import h5py
+        seq = sima.Sequence.create('ndarray', np.random.randint(
+            0, 1000, (11, 2, 16, 12, 2)).astype(float))
+        for compression, chunks in [(None, None), ('gzip', (4, 1, 8, 12, 1)),
+                                    ('lzf', None)]:
+            path = os.path.join(tmp_dir, 'export_%s.h5' % compression)
+            seq.export(path, fmt='HDF5', channel_names=['a', 'b'],
+                       compression=compression, chunks=chunks)
+            with h5py.File(path, 'r') as f:
+                dataset = f['imaging']
+                assert_equal(dataset.compression, compression)
+                assert_equal(dataset.chunks, chunks or (1, 2, 16, 12, 2))
+                assert_equal([d.label for d in dataset.dims],
+                             ['t', 'z', 'y', 'x', 'c'])
+                assert_equal(list(dataset.attrs['channel_names']),
+                             [b'a', b'b'])
+            exported = sima.Sequence.create('HDF5', path, 'tzyxc')
+            assert_array_equal(np.array(exported), np.array(seq))
+
+    def test_export_tiff(self):
+        global tmp_dir
+        data = np.random.randint(0, 250, (7, 2, 16, 12, 3)).astype(float)
+        seq = sima.Sequence.create('ndarray', data)
+        for fmt in ['TIFF8', 'TIFF16']:
+            filenames = [[os.path.join(tmp_dir, '%s_%d_%d.tif' % (fmt, p, c))
+                          for c in range(3)] for p in range(2)]
+            seq.export(filenames, fmt=fmt)
+            for p, c in np.ndindex(2, 3):
+                exported = sima.Sequence.create('TIFF', filenames[p][c])
+                assert_array_equal(np.array(exported)[:, 0, :, :, 0],
+                                   data[:, p, :, :, c])
+
+    def test_tiff_writer_bigtiff(self):
+        global tmp_dir
+        from sima.misc.tifffile import TiffFileWriter
+        data = np.arange(6 * 10 * 9).reshape(6, 10, 9).astype('uint16')
+        path = os.path.join(tmp_dir, 'bigtiff.tif')
+        for compress in [0, 6]:
+            writer = TiffFileWriter(path, bigtiff=True, compress=compress)
+            for page in data:
+                writer.write_page(page)
+            writer.close()
+            seq = sima.Sequence.create('TIFF', path)
+            assert_equal(_tiff_page_index(path)['num_pages'], 6)
+            assert_array_equal(np.array(seq)[:, 0, :, :, 0], data)
+
+    def test_export_chunked(self):
+        global tmp_dir
+        data = np.random.rand(11, 2, 16, 12, 3)
+        data[4, 1, 3:5] = np.nan
+        seq = sima.Sequence.create('ndarray', data)
+        path = os.path.join(tmp_dir, 'export.chunked')
+        for compression, chunks in [(None, None), ('zlib', (4, 1, 9, 5, 2)),
+                                    ('bz2', (3, 2, 16, 12, 1))]:
+            seq.export(path, fmt='chunked', compression=compression,
+                       chunks=chunks)
+            exported = sima.Sequence.create('chunked', path)
+            assert_equal(exported.shape, data.shape)
+            assert_array_equal(np.array(exported), data)
+            assert_array_equal(exported.get_frames(3, 9), data[3:9])
+            assert_array_equal(
+                exported._get_indexed_frames(
+                    2, 7, (slice(1, 2), slice(-5, None), [0, 11],
+                           slice(1, 3))),
+                data[2:7, 1:2, -5:, [0, 11], 1:3])
+        exported = sima.Sequence.create('chunked', path, dtype=None)
+        assert_equal(exported._get_frame(0).dtype, np.float64)
+        assert_equal(len(os.listdir(path)), 4 * 1 * 1 * 1 * 3 + 1)
+
+    def test_npy_and_raw(self):
+        global tmp_dir
+        data = np.random.randint(0, 1000, (7, 2, 6, 5, 2)).astype('uint16')
+        npy_path = os.path.join(tmp_dir, 'sequence.npy')
+        np.save(npy_path, data)
+        raw_path = os.path.join(tmp_dir, 'sequence.raw')
+        with open(raw_path, 'wb') as f:
+            f.write(b'header')
+            f.write(data.astype('>u2').tobytes())
+        sequences = [
+            sima.Sequence.create('npy', npy_path),
+            sima.Sequence.create('raw', raw_path, (None, 2, 6, 5, 2), '>u2',
+                                 offset=6)]
+        for seq in sequences:
+            assert_equal(seq.shape, data.shape)
+            frame = seq._get_frame(3)
+            assert_(isinstance(frame, np.memmap))
+            assert_(not frame.flags.writeable)
+            assert_array_equal(frame, data[3])
+            assert_array_equal(seq.get_frames(2, 5), data[2:5])
+            assert_array_equal(np.array(seq[:, 1, :, 2:4]),
+                               data[:, 1:2, :, 2:4])
+            assert_equal(seq.astype(float)._get_frame(0).dtype, np.float64)
+            d = seq._todict()
+            assert_array_equal(
+                np.array(d.pop('__class__')._from_dict(d)), data)
+
+    def test_saved_displacements(self):
+        global tmp_dir
+        data = np.random.rand(9, 2, 10, 12, 1)
+        displacements = np.zeros((9, 2, 10, 2), dtype=int)
+        displacements[:, :, :5] = np.random.randint(0, 3, (9, 2, 1, 2))
+        displacements[3, 1, 7] = [4, 1]
+        seq = sima.Sequence.create('ndarray', data).apply_displacements(
+            displacements, (2, 14, 15))
+        savedir = os.path.join(tmp_dir, 'saved_displacements')
+        os.mkdir(savedir)
+        d = seq._todict(savedir)
+        assert_(isinstance(d['displacements'], dict))
+        assert_equal(d, seq._todict(savedir))  # the same file is named
+        loaded = d.pop('__class__')._from_dict(d, savedir)
+        # only the displacements of the accessed frames are decoded
+        assert_(isinstance(loaded._displacements, _RunLengthDisplacements))
+        assert_array_equal(loaded.get_frames(2, 6), seq.get_frames(2, 6))
+        assert_array_equal(loaded._get_frame(3), seq._get_frame(3))
+        assert_(isinstance(loaded._displacements, _RunLengthDisplacements))
+        assert_array_equal(np.array(loaded), np.array(seq))
+        assert_array_equal(loaded.displacements, displacements)
+
+    def test_fill_gaps(self):
+        data = np.random.rand(9, 2, 5, 4, 1)
+        data[:3, 0, 1] = np.nan
+        data[4, :, :, 2] = np.nan
+        data[:, 1, 0, 0] = np.nan
+        expected = data.copy()
+        for idx in np.ndindex(data.shape[1:]):
+            pixel = data[(slice(None),) + idx]
+            observed = np.where(np.isfinite(pixel))[0]
+            for t in range(len(data)):
+                previous = observed[observed <= t]
+                if len(previous):
+                    expected[(t,) + idx] = pixel[previous[-1]]
+                elif len(observed):
+                    expected[(t,) + idx] = pixel[observed[0]]
+
+        class CountingSequence(object):
+            shape = data.shape
+            num_iterations = 0
+
+            def __iter__(self):
+                self.num_iterations += 1
+                return iter(data)
+
+        for max_buffered, num_iterations in [(None, 1), (2, 2)]:
+            seq = CountingSequence()
+            filled = np.array(list(_fill_gaps(seq, max_buffered)))
+            assert_array_equal(filled, expected)
+            assert_equal(seq.num_iterations, num_iterations)
 
 class TestMaskedSequence(object):
 